@@ -1,22 +1,86 @@
 from fastadmin import TortoiseModelAdmin, register, action, display, WidgetType
 from tortoise.fields import CharField, TextField, JSONField
+from tortoise.functions import Count
+from tortoise.transactions import in_transaction
 from .models import Album, Photo, PhotoFormat,AlbumCategory
 from fastapi import UploadFile
-from uuid import UUID, uuid4
+from uuid import UUID
 from uuid import UUID
 import os
-import re
-import base64
-from PIL import Image, ImageOps, UnidentifiedImageError
-import io
+import asyncio
+import logging
+from PIL import Image, UnidentifiedImageError
+from functools import partial
 from core.settings import settings
 from fastadmin.api.helpers import is_valid_base64
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, List, Tuple, Union
+from .image_pipeline import (
+    ALLOWED_IMAGE_EXTS,
+    ALLOWED_IMAGE_TYPES,
+    SNIFF_HEADER_SIZE,
+    THUMBNAIL_EXTS,
+    check_upload_size,
+    decode_base64_image,
+    delete_files,
+    extract_exif_data,
+    generate_derivatives,
+    get_file_ext,
+    open_image,
+    parse_data_uri,
+    persist_image,
+    persist_upload,
+    run_in_image_executor,
+    sniff_base64_image_format,
+    sniff_image_format,
+)
+
+logger = logging.getLogger(__name__)
+
+# 上传目录（路径在运行期间不变，导入时创建一次，避免每次上传重复makedirs）
+ALBUMS_DIR = os.path.join(settings.STATIC_DIR, "uploads", "albums")
+PHOTOS_DIR = os.path.join(settings.STATIC_DIR, "uploads", "photos")
+THUMBNAILS_DIR = os.path.join(PHOTOS_DIR, "thumbnails")
+PREVIEWS_DIR = os.path.join(PHOTOS_DIR, "previews")
+for _dir in (ALBUMS_DIR, PHOTOS_DIR, THUMBNAILS_DIR, PREVIEWS_DIR):
+    os.makedirs(_dir, exist_ok=True)
+
+# 上传目录对应的静态资源URL前缀
+ALBUMS_URL = "/static/uploads/albums"
+PHOTOS_URL = "/static/uploads/photos"
+THUMBNAILS_URL = f"{PHOTOS_URL}/thumbnails"
+PREVIEWS_URL = f"{PHOTOS_URL}/previews"
+
+# 封面上传文件不支持HEIC
+COVER_IMAGE_EXTS = ALLOWED_IMAGE_EXTS - {".heic"}
+# 没有可用图片时original_url使用的默认图片
+DEFAULT_PHOTO_URL = "/static/default.png"
+# 文件类型到PhotoFormat的映射，未知类型直接查表得到OTHER，无需捕获ValueError
+_PHOTO_FORMATS = {fmt.value: fmt for fmt in PhotoFormat}
+
+
+def _normalize_original_url(payload: Dict[str, Any], prefer_preview: bool = False) -> None:
+    """把payload中的original_url整理为非空的URL列表
+    
+    字符串转换为单元素列表；为空或只有默认图片时先回退到预览图URL，再回退到默认图片
+    
+    Args:
+        payload: 照片数据载荷，原地修改
+        prefer_preview: 为True时只要有预览图就使用预览图URL，保存到数据库前使用，original_url保存的是预览图
+    """
+    original_url = payload.get("original_url")
+    if isinstance(original_url, str):
+        original_url = [original_url]
+    preview_url = payload.get("preview_url")
+    if preview_url and (prefer_preview or not original_url or original_url == [DEFAULT_PHOTO_URL]):
+        original_url = [preview_url]
+    payload["original_url"] = original_url or [DEFAULT_PHOTO_URL]
 
-# 预览图最大尺寸常量
-PREVIEW_MAX_SIZE = 1500
-# 缩略图最大尺寸常量
-THUMBNAIL_MAX_SIZE = 200
+
+def _is_upload_url(value: Any) -> bool:
+    """上传字段的值是否已处理成URL：字符串或字符串列表，且不是data URI"""
+    if isinstance(value, list):
+        return all(_is_upload_url(item) for item in value)
+    return isinstance(value, str) and parse_data_uri(value) is None
 
 
 class CustomModelAdmin(TortoiseModelAdmin):
@@ -38,6 +102,12 @@ class CustomModelAdmin(TortoiseModelAdmin):
             for field in fields
             if field.name in payload
         }
+        # 已由具体的ModelAdmin处理成URL（或URL列表）的上传字段随普通字段一起写入，无需保存后再单独更新
+        fields_payload.update({
+            field.column_name: payload[field.name]
+            for field in upload_fields
+            if field.name in payload and _is_upload_url(payload[field.name])
+        })
         obj = await self.orm_save_obj(id, fields_payload)
         if not obj:
             return None
@@ -59,8 +129,8 @@ class CustomModelAdmin(TortoiseModelAdmin):
         return await self.serialize_obj(obj)
 
 
-def process_image(image: Image.Image, unique_id: str, upload_dir: str, width: int, height: int,file_ext:str='.png') -> Dict[str, Any]:
-    """处理图片，生成缩略图和预览图，保持横竖比例
+def process_image(image: Image.Image, unique_id: str, upload_dir: str, width: int, height: int,file_ext:str='.png', source: Union[bytes, str, None] = None) -> Dict[str, Any]:
+    """处理相册封面图片，生成缩略图和预览图，保持横竖比例
     
     Args:
         image: PIL Image对象
@@ -68,223 +138,229 @@ def process_image(image: Image.Image, unique_id: str, upload_dir: str, width: in
         upload_dir: 上传目录路径
         width: 原图宽度
         height: 原图高度
+        source: 原始图片字节或文件路径，安装了pyvips时由libvips直接生成
         
     Returns:
         包含图片处理结果的字典，包括缩略图和预览图URL
     """
-    # 初始化结果字典，设置原始图片URL
-    result = {}
-    # 注意：这里不设置original_url，应该由调用方提供
-    
-    # 首先处理EXIF旋转信息，确保图片方向正确
-    image = ImageOps.exif_transpose(image)
-    
-    # 生成缩略图 (最大边200px，保持横竖比例)
-    # 使用thumbnail方法自动保持比例
-    thumbnail = image.copy()
-    thumbnail.thumbnail((THUMBNAIL_MAX_SIZE, THUMBNAIL_MAX_SIZE), Image.LANCZOS)
+    # 封面缩略图URL由调用方保存到相册的cover_thumbnail_url字段，编码格式由配置决定
+    return generate_derivatives(
+        image, unique_id, width, height, file_ext,
+        original_url=ALBUMS_URL,
+        previews_dir=upload_dir,
+        previews_url=ALBUMS_URL,
+        thumbnails_dir=upload_dir,
+        thumbnails_url=ALBUMS_URL,
+        thumbnail_format=settings.COVER_THUMBNAIL_FORMAT.upper(),
+        source=source,
+    )
+
+
+def render_cover_image(source: Union[bytes, str], unique_id: str, upload_dir: str, file_ext: str) -> Dict[str, Any]:
+    """生成封面的缩略图和预览图
     
-    # 保存缩略图
-    thumbnail_filename = f"{unique_id}_thumbnail.jpg"
-    thumbnail_path = os.path.join(upload_dir, thumbnail_filename)
-    thumbnail.convert("RGB").save(thumbnail_path, "JPEG", quality=85)
-    result["thumbnail_url"] = f"/static/uploads/albums/{thumbnail_filename}"
+    全部为同步的CPU/磁盘操作，由调用方放到图片处理线程池执行，避免阻塞事件循环。
+    原图由调用方在另一个线程中同时写入
     
-    # 生成预览图 (最大边1500px，保持横竖比例)
-    if width > PREVIEW_MAX_SIZE or height > PREVIEW_MAX_SIZE:
-        # 使用thumbnail方法自动保持比例
-        preview = image.copy()
-        preview.thumbnail((PREVIEW_MAX_SIZE, PREVIEW_MAX_SIZE), Image.LANCZOS)
+    Args:
+        source: 图片文件内容，或已保存的原图路径
+        unique_id: 唯一标识符
+        upload_dir: 上传目录路径
+        file_ext: 文件扩展名（带点号）
         
-        # 保存预览图
-        preview_filename = f"{unique_id}_preview.webp"
-        preview_path = os.path.join(upload_dir, preview_filename)
-        preview.save(preview_path, "WEBP", quality=90)
-        result["preview_url"] = f"/static/uploads/albums/{preview_filename}"
-    else:
-        # 如果原图小于预览图尺寸，则使用原图作为预览图
-        # 确保original_url已经被设置
-        unique_filename = unique_id+file_ext
-        if "original_url" not in result:
-            # 如果没有设置original_url，使用一个默认值
-            result["original_url"] = f"/static/uploads/albums/{unique_filename}"
-        result["preview_url"] = result["original_url"]
+    Returns:
+        包含原图、缩略图和预览图URL以及EXIF信息的字典
+    """
+    original_filename = f"{unique_id}{file_ext}"
     
+    # 只解析文件头获取尺寸和EXIF，需要生成缩略图和预览图时再解码
+    image, (width, height) = open_image(source, decode=False)
+    result = extract_exif_data(image)
+    result.update(process_image(image, unique_id, upload_dir, width, height, file_ext, source=source))
+    # 设置原图URL
+    result["original_url"] = f"{ALBUMS_URL}/{original_filename}"
     return result
 
 
-def ensure_upload_dirs() -> Tuple[str, str, str]:
-    """确保上传目录存在
+def process_photo_image(image: Image.Image, unique_id: str, width: int, height: int, file_ext: str = '.jpg', source: Union[bytes, str, None] = None) -> Dict[str, Any]:
+    """处理照片，生成缩略图和预览图，保持横竖比例
     
+    Args:
+        image: PIL Image对象
+        unique_id: 唯一标识符
+        width: 原图宽度
+        height: 原图高度
+        file_ext: 文件扩展名，默认为.jpg
+        source: 原始图片字节或文件路径，安装了pyvips时由libvips直接生成
+        
     Returns:
-        包含上传目录、缩略图目录和预览图目录路径的元组
+        包含图片处理结果的字典，包括缩略图和预览图URL
     """
-    upload_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos")
-    thumbnails_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos", "thumbnails")
-    previews_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos", "previews")
+    # 照片缩略图URL保存在数据库中，使用WebP编码，同等画质下文件比JPEG小约三成
+    return generate_derivatives(
+        image, unique_id, width, height, file_ext,
+        original_url=PHOTOS_URL,
+        previews_dir=PREVIEWS_DIR,
+        previews_url=PREVIEWS_URL,
+        thumbnails_dir=THUMBNAILS_DIR,
+        thumbnails_url=THUMBNAILS_URL,
+        thumbnail_format="WEBP",
+        source=source,
+    )
+
+
+def render_photo_image(source: Union[bytes, str], unique_id: str, file_ext: str, image_format: Optional[str] = None) -> Dict[str, Any]:
+    """解码照片，提取EXIF并生成缩略图和预览图
     
-    os.makedirs(upload_dir, exist_ok=True)
-    os.makedirs(thumbnails_dir, exist_ok=True)
-    os.makedirs(previews_dir, exist_ok=True)
+    全部为同步的CPU/磁盘操作，由调用方放到图片处理线程池（或进程池）执行。
+    与render_cover_image一样是模块级函数，只接收普通参数，提交到进程池时无需pickle管理类实例
     
-    return upload_dir, thumbnails_dir, previews_dir
+    Args:
+        source: 图片文件内容，或已保存的原图路径
+        unique_id: 唯一标识符
+        file_ext: 文件扩展名
+        image_format: 文件头识别出的格式
+        
+    Returns:
+        包含图片尺寸、EXIF信息以及缩略图和预览图URL的字典
+    """
+    # 只解析文件头获取原图尺寸和EXIF，需要生成缩略图和预览图时再解码
+    image, (width, height) = open_image(source, image_format, decode=False)
+    result = {"width": width, "height": height}
+    result.update(extract_exif_data(image))
+    result.update(process_photo_image(image, unique_id, width, height, file_ext, source=source))
+    return result
+
 
+def _static_file_path(url: Any) -> Optional[str]:
+    """将/static/uploads/下的URL转换为磁盘路径，其他URL返回None"""
+    if isinstance(url, str) and url.startswith('/static/uploads/'):
+        return os.path.join(settings.STATIC_DIR, url.replace('/static/', ''))
+    return None
 
-def save_image_file(file_path: str, content: bytes) -> None:
-    """保存图片文件到指定路径
+
+def collect_photo_file_paths(photos: List[Photo]) -> set:
+    """收集照片的原图、缩略图和预览图文件路径
+    
+    original_url可能是列表、字符串或字典。预览图或缩略图对应的原图（不带_preview或_thumbnail后缀）
+    按唯一标识符前缀匹配，所有照片只需列一次原图目录
     
     Args:
-        file_path: 文件保存路径
-        content: 文件内容
+        photos: 照片对象列表
+        
+    Returns:
+        文件路径集合
     """
-    with open(file_path, "wb") as f:
-        f.write(content)
-        f.flush()
-        os.fsync(f.fileno())
+    paths = set()
+    unique_ids = set()
+    for photo in photos:
+        if isinstance(photo.original_url, list):
+            urls = list(photo.original_url)
+        elif isinstance(photo.original_url, dict):
+            urls = list(photo.original_url.values())
+        else:
+            urls = [photo.original_url]
+        urls += [photo.thumbnail_url, photo.preview_url]
+        
+        for url in urls:
+            file_path = _static_file_path(url)
+            if file_path is None:
+                continue
+            paths.add(file_path)
+            file_name = os.path.basename(url)
+            if "_preview" in file_name or "_thumbnail" in file_name:
+                unique_ids.add(file_name.split("_")[0])
+    
+    if unique_ids:
+        for f in os.listdir(PHOTOS_DIR):
+            if f.partition('.')[0] in unique_ids:
+                paths.add(os.path.join(PHOTOS_DIR, f))
+    return paths
+
+
+def _file_unique_id(path: str) -> str:
+    """从原图、预览图或缩略图的路径或URL中取出唯一标识符"""
+    return os.path.basename(path).split("_")[0].partition('.')[0]
 
 
-def create_file_payload(unique_filename: str, payload: Dict[str, Any], file_type: str = "photos") -> Dict[str, Any]:
-    """创建文件处理的payload
+async def exclude_shared_photo_files(paths: set, photos: List[Photo]) -> set:
+    """排除仍被其他照片引用的文件
+    
+    base64上传的照片以内容哈希作为唯一标识符，内容相同的照片共用同一组原图、预览图和缩略图，
+    只有不再被其他照片引用时才能删除
     
     Args:
-        unique_filename: 唯一文件名
-        payload: 原始payload
-        file_type: 文件类型，默认为photos
+        paths: 待删除照片的文件路径集合
+        photos: 待删除的照片对象列表，可以是尚未保存到数据库的照片
         
     Returns:
-        处理后的payload字典
+        可以删除的文件路径集合
     """
-    return {
-        "original_url": f"/static/uploads/{file_type}/{unique_filename}",
-        "album": payload.get("album"),
-        "title": payload.get("title") or "未命名照片",
-        "description": payload.get("description"),
-        "is_active": payload.get("is_active", True),
-        "sort_order": payload.get("sort_order", 0),
-        # 默认值设置
-    }
+    thumbnail_urls = [photo.thumbnail_url for photo in photos if photo.thumbnail_url]
+    if not paths or not thumbnail_urls:
+        return paths
+    query = Photo.filter(thumbnail_url__in=thumbnail_urls)
+    # 未保存到数据库的照片没有主键
+    photo_ids = [photo.id for photo in photos if photo.id is not None]
+    if photo_ids:
+        query = query.exclude(id__in=photo_ids)
+    shared_urls = await query.values_list("thumbnail_url", flat=True)
+    if not shared_urls:
+        return paths
+    shared_ids = {_file_unique_id(url) for url in shared_urls}
+    return {path for path in paths if _file_unique_id(path) not in shared_ids}
 
 
-def process_base64_image(base64_str: str, upload_dir: str) -> Tuple[str, bytes, str]:
+def process_base64_image(base64_str: str) -> Tuple[str, bytes, str]:
     """处理base64编码的图片
     
     Args:
         base64_str: base64编码的图片字符串
-        upload_dir: 上传目录路径
         
     Returns:
-        包含文件名、图片数据和文件类型的元组
+        包含唯一标识符、图片数据和文件类型的元组，原图、缩略图和预览图文件名都以该标识符为前缀
     
     Raises:
         ValueError: 当base64数据格式无效或图片格式不支持时
     """
-    base64_pattern = r'^data:image/(\w+);base64,(.+)$'
-    match = re.match(base64_pattern, base64_str)
+    parsed = parse_data_uri(base64_str)
     
-    if not match:
+    if not parsed:
         raise ValueError("无效的base64图片数据")
     
-    file_type = match.group(1)
-    base64_data = match.group(2)
+    file_type, base64_data = parsed
     
-    if file_type not in ['jpeg', 'jpg', 'png', 'gif', 'webp', 'heic']:
+    if file_type not in ALLOWED_IMAGE_TYPES:
         raise ValueError(f"不支持的图片格式: {file_type}")
     
-    unique_filename = f"{uuid4().hex}"
-    image_data = base64.b64decode(base64_data)
+    # 先检查文件头再解码整个图片
+    if sniff_base64_image_format(base64_data) is None:
+        raise ValueError("无效的base64图片数据：无法识别图片格式")
     
-    return unique_filename, image_data,file_type
+    # 以内容哈希作为唯一标识符，重复上传相同图片时复用已生成的文件
+    unique_id, image_data = decode_base64_image(base64_data)
+    
+    return unique_id, image_data, file_type
 
 
-def process_upload_file(file: UploadFile) -> Tuple[str, str]:
-    """处理上传的文件
+def process_upload_file(file: UploadFile) -> str:
+    """检查上传文件的扩展名
+    
+    文件名由调用方根据文件内容计算，与base64图片一致
     
     Args:
         file: FastAPI的UploadFile对象
         
     Returns:
-        包含文件扩展名和唯一文件名的元组
+        文件扩展名
     
     Raises:
         ValueError: 当文件格式不支持时
     """
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    if file_ext not in [".jpg", ".jpeg", ".png", ".gif", ".webp"]:
+    file_ext = get_file_ext(file.filename)
+    if file_ext not in COVER_IMAGE_EXTS:
         raise ValueError(f"不支持的图片格式: {file_ext}")
-    
-    unique_filename = f"{uuid4().hex}{file_ext}"
-    return file_ext, unique_filename
-
-
-def extract_exif_data(image: Image.Image) -> Dict[str, Any]:
-    """从图片中提取EXIF数据
-    
-    Args:
-        image: PIL Image对象
-        
-    Returns:
-        包含提取的数据字典（taken_at, latitude, longitude等）
-    """
-    result = {}
-    try:
-        if hasattr(image, '_getexif') and image._getexif() is not None:
-            exif = image._getexif()
-            
-            # 提取拍摄时间
-            if 36867 in exif:  # DateTimeOriginal
-                from datetime import datetime
-                import pytz
-                # 解析EXIF中的时间（通常是本地时间）
-                taken_at = datetime.strptime(exif[36867], "%Y:%m:%d %H:%M:%S")
-                # 将时间设置为上海时区
-                shanghai_tz = pytz.timezone('Asia/Shanghai')
-                taken_at_shanghai = shanghai_tz.localize(taken_at)
-                result["taken_at"] = taken_at_shanghai.isoformat()
-            
-            # 提取GPS信息
-            if 34853 in exif:  # GPSInfo
-                gps_info = exif[34853]
-                if gps_info:
-                    # 提取纬度
-                    if 2 in gps_info and 1 in gps_info:  # GPSLatitude and GPSLatitudeRef
-                        lat = gps_info[2]
-                        lat_ref = gps_info[1]
-                        if isinstance(lat, (list, tuple)) and len(lat) >= 3:
-                            latitude = lat[0] + lat[1]/60 + lat[2]/3600
-                            if lat_ref == 'S':
-                                latitude = -latitude
-                            result["latitude"] = latitude
-                    
-                    # 提取经度
-                    if 4 in gps_info and 3 in gps_info:  # GPSLongitude and GPSLongitudeRef
-                        lon = gps_info[4]
-                        lon_ref = gps_info[3]
-                        if isinstance(lon, (list, tuple)) and len(lon) >= 3:
-                            longitude = lon[0] + lon[1]/60 + lon[2]/3600
-                            if lon_ref == 'W':
-                                longitude = -longitude
-                            result["longitude"] = longitude
-                            
-    except Exception as e:
-        print(f"提取EXIF数据时出错: {str(e)}")
-    
-    return result
-
-
-def get_image_dimensions(image: Image.Image) -> Dict[str, int]:
-    """获取图片尺寸信息
-    
-    Args:
-        image: PIL Image对象
-        
-    Returns:
-        包含图片宽度和高度的字典
-    """
-    width, height = image.size
-    return {
-        "width": width,
-        "height": height
-    }
+    return file_ext
 
 
 @register(AlbumCategory)
@@ -327,7 +403,7 @@ class CategoryModelAdmin(TortoiseModelAdmin):
         return await Album.filter(category_id=obj.id).count()
 
 @register(Album)
-class AlbumModelAdmin(TortoiseModelAdmin):
+class AlbumModelAdmin(CustomModelAdmin):
     model = Album
     icon = "image"
     verbose_name="相册"
@@ -339,6 +415,8 @@ class AlbumModelAdmin(TortoiseModelAdmin):
     search_fields = ["name", "description"]
     list_per_page = 15
     ordering = ["-created_at"]
+    # 列表页随相册一起查询分类，category_name无需逐行查询
+    list_select_related = ["category"]
     
     form_fields = {
         "name": CharField(max_length=255, description="相册名称"),
@@ -352,8 +430,8 @@ class AlbumModelAdmin(TortoiseModelAdmin):
         "taken_at": WidgetType.DateTimePicker
     }
     
-    # 排除字段，确保filename不在admin后台显示
-    exclude = ["filename"]
+    # 排除字段，确保filename和封面缩略图URL不在admin后台显示
+    exclude = ["filename", "cover_thumbnail_url"]
     formfield_overrides = {
         "cover_image": (WidgetType.Upload, {"required": False, "upload_action_name": "upload"}),
     }
@@ -368,6 +446,9 @@ class AlbumModelAdmin(TortoiseModelAdmin):
         Returns:
             分类名称，如果分类不存在则返回"-"
         """
+        # 列表页通过list_select_related已随相册一起查询出分类，直接读取，避免每行一次查询
+        if isinstance(obj.category, AlbumCategory):
+            return obj.category.name
         if obj.category_id:
             category = await AlbumCategory.get_or_none(id=obj.category_id)
             if category:
@@ -384,8 +465,36 @@ class AlbumModelAdmin(TortoiseModelAdmin):
         Returns:
             照片数量
         """
+        # 列表页由orm_get_list批量统计，其他场景单独查询
+        photo_count = getattr(obj, "_photo_count", None)
+        if photo_count is not None:
+            return photo_count
         return await Photo.filter(album_id=obj.id).count()
     
+    async def orm_get_list(
+        self,
+        offset: int | None = None,
+        limit: int | None = None,
+        search: str | None = None,
+        sort_by: str | None = None,
+        filters: dict | None = None,
+    ) -> tuple[list[Any], int]:
+        """获取相册列表，并用一次聚合查询统计当前页所有相册的照片数量
+        
+        Returns:
+            相册对象列表和总数
+        """
+        albums, total = await super().orm_get_list(offset, limit, search, sort_by, filters)
+        if albums:
+            photo_counts = dict(
+                await Album.filter(id__in=[album.id for album in albums])
+                .annotate(photo_total=Count("photos"))
+                .values_list("id", "photo_total")
+            )
+            for album in albums:
+                album._photo_count = photo_counts.get(album.id, 0)
+        return albums, total
+    
     def is_valid_base64(self, base64_str: str) -> bool:
         """验证字符串是否为有效的base64图片格式
         
@@ -398,86 +507,69 @@ class AlbumModelAdmin(TortoiseModelAdmin):
         if not isinstance(base64_str, str):
             return False
             
-        base64_pattern = r'^data:image/(\w+);base64,(.+)$'
-        match = re.match(base64_pattern, base64_str)
+        parsed = parse_data_uri(base64_str)
         
-        if not match:
+        if not parsed:
             return False
             
-        file_type = match.group(1).lower()
-        if file_type not in ['jpeg', 'jpg', 'png', 'gif', 'webp', 'heic']:
+        file_type, base64_data = parsed
+        if file_type.lower() not in ALLOWED_IMAGE_TYPES:
             return False
             
-        try:
-            base64_data = match.group(2)
-            base64.b64decode(base64_data)
-            return True
-        except Exception:
-            return False
+        # 只解码开头几个字符检查文件头，完整数据在真正使用时解码并校验
+        return sniff_base64_image_format(base64_data) is not None
 
-    async def process_cover_image(self, file: UploadFile | str) -> str:
-        """处理封面图片
+    async def render_cover(self, file: UploadFile | str) -> Dict[str, Any]:
+        """保存封面原图，生成缩略图和预览图并提取EXIF
+        
+        EXIF在生成缩略图时从已解析的文件头中读取，无需再次读取文件或解码base64
         
         Args:
             file: 上传的文件对象或base64字符串
             
         Returns:
-            处理后的预览图片URL
+            包含预览图URL和EXIF信息（taken_at, latitude, longitude）的字典
             
         Raises:
             ValueError: 当文件格式不支持或处理失败时
         """
-        upload_dir = os.path.join(settings.STATIC_DIR, "uploads", "albums")
-        os.makedirs(upload_dir, exist_ok=True)
+        upload_dir = ALBUMS_DIR
         
         try:
             if isinstance(file, UploadFile):
                 # 处理上传的文件
-                file_ext, unique_filename = process_upload_file(file)
-                content = await file.read()
-                
-                # 保存原始文件
-                original_path = os.path.join(upload_dir, unique_filename)
-                save_image_file(original_path, content)
-                
-                # 处理图片生成缩略图和预览图
-                image = Image.open(io.BytesIO(content))
-                dimensions = get_image_dimensions(image)
-                
-                # 生成缩略图和预览图，同时保存原始文件
-                result = process_image(image, unique_filename.split('.')[0], upload_dir, dimensions["width"], dimensions["height"], file_ext)
-                # 设置原图URL
-                result["original_url"] = f"/static/uploads/albums/{unique_filename}"
-                # 返回预览图URL作为cover_image
-                return result["preview_url"]
-                
+                file_ext = process_upload_file(file)
+                check_upload_size(file.size)
+                # 只读取文件头检查格式，原图随后按块写盘并直接从文件解码
+                if sniff_image_format(await file.read(SNIFF_HEADER_SIZE)) is None:
+                    raise ValueError(f"无法识别图片格式: {file.filename}")
+                await file.seek(0)
+                # 按块保存原始文件，写盘时按内容哈希命名，重复上传时复用已生成的文件；再在线程池中生成缩略图和预览图
+                _, result, _ = await persist_upload(
+                    file.file,
+                    upload_dir,
+                    file_ext,
+                    partial(render_cover_image, upload_dir=upload_dir, file_ext=file_ext),
+                )
+                return result
             elif isinstance(file, str):
                 if not self.is_valid_base64(file):
                     raise ValueError("无效的base64图片格式或图片类型")
                     
                 # 处理base64编码的图片
-                unique_filename, image_data, file_type = process_base64_image(file, upload_dir)
-                
-                # 保存原始文件
-                original_filename = f"{unique_filename}.{file_type}"
-                original_path = os.path.join(upload_dir, original_filename)
-                save_image_file(original_path, image_data)
-                
-                # 处理图片生成缩略图和预览图
-                image = Image.open(io.BytesIO(image_data))
-                dimensions = get_image_dimensions(image)
-                
-                # 生成缩略图和预览图，同时保存原始文件
-                result = process_image(image, unique_filename, upload_dir, dimensions["width"], dimensions["height"], f".{file_type}")
-                # 设置原图URL
-                result["original_url"] = f"/static/uploads/albums/{original_filename}"
-                # 返回预览图URL作为cover_image
-                return result["preview_url"]
+                unique_id, content, file_type = await run_in_image_executor(process_base64_image, file)
+                file_ext = f".{file_type}"
+                # 保存原始文件并在线程池中生成缩略图和预览图
+                return await persist_image(
+                    content,
+                    f"{upload_dir}/{unique_id}{file_ext}",
+                    partial(render_cover_image, unique_id=unique_id, upload_dir=upload_dir, file_ext=file_ext),
+                )
             else:
                 raise ValueError("不支持的文件格式，仅支持文件上传或base64图片")
                 
         except Exception as e:
-            print(f"处理封面图片时出错: {str(e)}")
+            logger.exception("处理封面图片时出错")
             if isinstance(e, ValueError):
                 raise e
             raise ValueError(f"处理封面图片失败: {str(e)}")
@@ -489,42 +581,24 @@ class AlbumModelAdmin(TortoiseModelAdmin):
             
             if "cover_image" in payload and payload["cover_image"] is not None:
                 file = payload["cover_image"]
-                # 处理封面图片并确保正确赋值给payload
-                image_url = await self.process_cover_image(file)
+                # 处理封面图片并确保正确赋值给payload，预览图URL作为cover_image
+                rendered = await self.render_cover(file)
+                image_url = rendered["preview_url"]
                 payload["cover_image"] = image_url
-                print(f"处理后的封面图片URL: {image_url}")
+                # 缩略图格式在生成时确定，URL随相册保存，读取相册列表时无需检查文件
+                payload["cover_thumbnail_url"] = rendered["thumbnail_url"]
+                logger.debug("处理后的封面图片URL: %s", image_url)
                 
                 # 从图片URL中提取文件名并保存到filename字段（不包含扩展名）
                 if image_url:
                     filename_with_ext = os.path.basename(image_url)
                     filename = os.path.splitext(filename_with_ext)[0]  # 去掉扩展名
                     payload["filename"] = filename
-                    print(f"提取的文件名（无扩展名）: {filename}")
+                    logger.debug("提取的文件名（无扩展名）: %s", filename)
                 
-                # 尝试从封面图片中提取EXIF数据
-                try:
-                    if isinstance(file, UploadFile):
-                        # 重新读取文件内容
-                        await file.seek(0)
-                        content = await file.read()
-                        image = Image.open(io.BytesIO(content))
-                        exif_data = extract_exif_data(image)
-                    elif isinstance(file, str) and self.is_valid_base64(file):
-                        # 从base64提取图片数据
-                        match = re.match(r'^data:image/(\w+);base64,(.+)$', file)
-                        if match:
-                            base64_data = match.group(2)
-                            content = base64.b64decode(base64_data)
-                            image = Image.open(io.BytesIO(content))
-                            exif_data = extract_exif_data(image)
-                    
-                    print(f"从封面图片提取的EXIF数据: {exif_data}")
-                except Exception as e:
-                    print(f"提取封面图片EXIF数据时出错: {str(e)}")
-            
-            # 确保cover_image字段被正确设置
-            if "cover_image" in payload and payload["cover_image"] and isinstance(payload["cover_image"], str):
-                print(f"保存前的cover_image: {payload['cover_image']}")
+                # 生成缩略图时已从封面图片中提取EXIF数据
+                exif_data = {key: rendered[key] for key in ("taken_at", "latitude", "longitude") if key in rendered}
+                logger.debug("从封面图片提取的EXIF数据: %s", exif_data)
             
             # 如果从图片中提取到了EXIF数据，更新payload中的相关字段
             if exif_data:
@@ -536,41 +610,14 @@ class AlbumModelAdmin(TortoiseModelAdmin):
                 if "taken_at" not in payload or payload["taken_at"] is None:
                     payload["taken_at"] = exif_data.get("taken_at")
                 
-                print(f"从EXIF更新的字段: 纬度={payload.get('latitude')}, 经度={payload.get('longitude')}, 拍摄时间={payload.get('taken_at')}")
+                logger.debug("从EXIF更新的字段: 纬度=%s, 经度=%s, 拍摄时间=%s", payload.get("latitude"), payload.get("longitude"), payload.get("taken_at"))
             
+            # cover_image已处理成URL，与EXIF字段一起随普通字段写入
             result = await super().save_model(id, payload)
             
-            # 验证保存结果
-            if result and "id" in result:
-                saved_album = await self.model.get(id=result["id"])
-                print(f"保存后的album.cover_image: {saved_album.cover_image}")
-                
-                # 如果cover_image没有正确保存，尝试直接更新
-                if "cover_image" in payload and payload["cover_image"] and saved_album.cover_image != payload["cover_image"]:
-                    saved_album.cover_image = payload["cover_image"]
-                    await saved_album.save()
-                    print(f"更新后的album.cover_image: {saved_album.cover_image}")
-                
-                # 如果EXIF数据字段没有正确保存，尝试直接更新
-                needs_update = False
-                if exif_data:
-                    if "latitude" in exif_data and saved_album.latitude is None:
-                        saved_album.latitude = exif_data["latitude"]
-                        needs_update = True
-                    if "longitude" in exif_data and saved_album.longitude is None:
-                        saved_album.longitude = exif_data["longitude"]
-                        needs_update = True
-                    if "taken_at" in exif_data and saved_album.taken_at is None:
-                        saved_album.taken_at = exif_data["taken_at"]
-                        needs_update = True
-                
-                if needs_update:
-                    await saved_album.save()
-                    print(f"更新后的EXIF数据: 纬度={saved_album.latitude}, 经度={saved_album.longitude}, 拍摄时间={saved_album.taken_at}")
-            
             return result
         except Exception as e:
-            print(f"保存相册时出错: {str(e)}")
+            logger.exception("保存相册时出错")
             raise e
         
     async def delete_model(self, id: str) -> bool:
@@ -585,149 +632,34 @@ class AlbumModelAdmin(TortoiseModelAdmin):
         try:
             # 获取相册对象
             album = await self.model.get(id=id)
+            paths = set()
             
-            # 删除封面图片及其预览图和缩略图
-            if album.cover_image and album.cover_image.startswith('/static/uploads/'):
-                # 删除原图
-                cover_path = os.path.join(settings.STATIC_DIR, album.cover_image.replace('/static/', ''))
-                if os.path.exists(cover_path):
-                    os.remove(cover_path)
-                
-                # 构造并删除预览图和缩略图
-                # 从URL中提取文件名部分
-                file_name = os.path.basename(album.cover_image)
-                base_name = os.path.splitext(file_name)[0]
-                dir_name = os.path.dirname(cover_path)
-                
-                # 删除预览图
-                preview_filename = f"{base_name}_preview.webp"
-                preview_path = os.path.join(dir_name, preview_filename)
-                if os.path.exists(preview_path):
-                    print(f"删除预览图文件: {preview_path}")
-                    os.remove(preview_path)
-                
-                # 删除缩略图
-                thumbnail_filename = f"{base_name}_thumbnail.jpg"
-                thumbnail_path = os.path.join(dir_name, thumbnail_filename)
-                if os.path.exists(thumbnail_path):
-                    print(f"删除缩略图文件: {thumbnail_path}")
-                    os.remove(thumbnail_path)
+            # 封面图片及其原图、预览图和缩略图
+            # cover_image保存的是预览图URL（小图时为原图URL），文件名都以唯一标识符开头
+            # 相同内容的封面以内容哈希命名，被其他相册共用时保留文件
+            cover_path = _static_file_path(album.cover_image)
+            if cover_path and not await self.model.filter(cover_image=album.cover_image).exclude(id=id).exists():
+                cover_dir, cover_name = os.path.split(cover_path)
+                unique_id = _file_unique_id(cover_name)
+                paths.update((cover_path, f"{cover_dir}/{unique_id}_preview.webp"))
+                # 切换过缩略图格式时可能两种都有，不存在的文件直接跳过
+                paths.update(f"{cover_dir}/{unique_id}_thumbnail{ext}" for ext in THUMBNAIL_EXTS.values())
+                # 原图扩展名未知，逐个尝试，不存在的文件直接跳过
+                paths.update(f"{cover_dir}/{unique_id}{ext}" for ext in ALLOWED_IMAGE_EXTS)
             
-            # 获取相册下的所有照片
-            photos = await Photo.filter(album_id=id)
+            # 相册下所有照片的文件，只查询需要的字段
+            photos = await Photo.filter(album_id=id).only("id", "original_url", "thumbnail_url", "preview_url")
+            photo_paths = await run_in_image_executor(collect_photo_file_paths, photos)
+            paths.update(await exclude_shared_photo_files(photo_paths, photos))
             
-            # 删除每张照片的文件
-            for photo in photos:
-                # 删除原图 - 处理original_url可能是列表、字符串或其他类型的情况
-                try:
-                    if isinstance(photo.original_url, list):
-                        for url in photo.original_url:
-                            if isinstance(url, str) and url.startswith('/static/uploads/'):
-                                file_path = os.path.join(settings.STATIC_DIR, url.replace('/static/', ''))
-                                if os.path.exists(file_path):
-                                    print(f"删除照片原图文件: {file_path}")
-                                    os.remove(file_path)
-                                
-                                # 检查并删除可能存在的原始图片（不带_preview或_thumbnail后缀）
-                                file_name = os.path.basename(url)
-                                if "_preview" in file_name or "_thumbnail" in file_name:
-                                    base_name = file_name.split("_")[0]
-                                    photos_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos")
-                                    for f in os.listdir(photos_dir):
-                                        if f.startswith(base_name) and not ("_preview" in f or "_thumbnail" in f):
-                                            original_file_path = os.path.join(photos_dir, f)
-                                            if os.path.exists(original_file_path):
-                                                print(f"删除关联的原始图片文件: {original_file_path}")
-                                                os.remove(original_file_path)
-                    elif isinstance(photo.original_url, str) and photo.original_url.startswith('/static/uploads/'):
-                        file_path = os.path.join(settings.STATIC_DIR, photo.original_url.replace('/static/', ''))
-                        if os.path.exists(file_path):
-                            print(f"删除照片原图文件: {file_path}")
-                            os.remove(file_path)
-                        
-                        # 检查并删除可能存在的原始图片（不带_preview或_thumbnail后缀）
-                        file_name = os.path.basename(photo.original_url)
-                        if "_preview" in file_name or "_thumbnail" in file_name:
-                            base_name = file_name.split("_")[0]
-                            photos_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos")
-                            for f in os.listdir(photos_dir):
-                                if f.startswith(base_name) and not ("_preview" in f or "_thumbnail" in f):
-                                    original_file_path = os.path.join(photos_dir, f)
-                                    if os.path.exists(original_file_path):
-                                        print(f"删除关联的原始图片文件: {original_file_path}")
-                                        os.remove(original_file_path)
-                    elif isinstance(photo.original_url, dict):
-                        # 处理可能是字典的情况
-                        for key, url in photo.original_url.items():
-                            if isinstance(url, str) and url.startswith('/static/uploads/'):
-                                file_path = os.path.join(settings.STATIC_DIR, url.replace('/static/', ''))
-                                if os.path.exists(file_path):
-                                    print(f"删除照片原图文件(dict): {file_path}")
-                                    os.remove(file_path)
-                                
-                                # 检查并删除可能存在的原始图片（不带_preview或_thumbnail后缀）
-                                file_name = os.path.basename(url)
-                                if "_preview" in file_name or "_thumbnail" in file_name:
-                                    base_name = file_name.split("_")[0]
-                                    photos_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos")
-                                    for f in os.listdir(photos_dir):
-                                        if f.startswith(base_name) and not ("_preview" in f or "_thumbnail" in f):
-                                            original_file_path = os.path.join(photos_dir, f)
-                                            if os.path.exists(original_file_path):
-                                                print(f"删除关联的原始图片文件: {original_file_path}")
-                                                os.remove(original_file_path)
-                except Exception as e:
-                    print(f"删除照片原图文件时出错: {str(e)}")
-                
-                # 删除缩略图
-                try:
-                    if photo.thumbnail_url and photo.thumbnail_url.startswith('/static/uploads/'):
-                        thumbnail_path = os.path.join(settings.STATIC_DIR, photo.thumbnail_url.replace('/static/', ''))
-                        if os.path.exists(thumbnail_path):
-                            print(f"删除照片缩略图文件: {thumbnail_path}")
-                            os.remove(thumbnail_path)
-                        
-                        # 检查并删除可能存在的原始图片
-                        file_name = os.path.basename(photo.thumbnail_url)
-                        if "_thumbnail" in file_name:
-                            base_name = file_name.split("_")[0]
-                            photos_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos")
-                            for f in os.listdir(photos_dir):
-                                if f.startswith(base_name) and not ("_preview" in f or "_thumbnail" in f):
-                                    original_file_path = os.path.join(photos_dir, f)
-                                    if os.path.exists(original_file_path):
-                                        print(f"删除关联的原始图片文件: {original_file_path}")
-                                        os.remove(original_file_path)
-                except Exception as e:
-                    print(f"删除照片缩略图文件时出错: {str(e)}")
-                
-                # 删除预览图
-                try:
-                    if photo.preview_url and photo.preview_url.startswith('/static/uploads/'):
-                        preview_path = os.path.join(settings.STATIC_DIR, photo.preview_url.replace('/static/', ''))
-                        if os.path.exists(preview_path):
-                            print(f"删除照片预览图文件: {preview_path}")
-                            os.remove(preview_path)
-                        
-                        # 检查并删除可能存在的原始图片
-                        file_name = os.path.basename(photo.preview_url)
-                        if "_preview" in file_name:
-                            base_name = file_name.split("_")[0]
-                            photos_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos")
-                            for f in os.listdir(photos_dir):
-                                if f.startswith(base_name) and not ("_preview" in f or "_thumbnail" in f):
-                                    original_file_path = os.path.join(photos_dir, f)
-                                    if os.path.exists(original_file_path):
-                                        print(f"删除关联的原始图片文件: {original_file_path}")
-                                        os.remove(original_file_path)
-                except Exception as e:
-                    print(f"删除照片预览图文件时出错: {str(e)}")
+            # 并发删除所有文件
+            await delete_files(paths)
             
             # 删除相册记录（这会级联删除所有关联的照片记录）
             return await super().delete_model(id)
             
         except Exception as e:
-            print(f"删除相册及其图片文件时出错: {str(e)}")
+            logger.exception("删除相册及其图片文件时出错")
             raise e
 
     async def to_dict(self, **kwargs) -> dict:
@@ -740,7 +672,7 @@ class AlbumModelAdmin(TortoiseModelAdmin):
         """
         # 先获取原始数据字典
         data = await super().to_dict(**kwargs)
-        print(f"to_dict 原始数据字典: {data}")
+        logger.debug("to_dict 原始数据字典: %s", data)
 
 @register(Photo)
 class PhotoModelAdmin(CustomModelAdmin):
@@ -761,6 +693,8 @@ class PhotoModelAdmin(CustomModelAdmin):
     search_fields = ["title", "description", "original_filename"]
     list_per_page = 15
     ordering = ["-created_at"]
+    # 列表页一次JOIN查询出所属相册，album_name无需逐行查询
+    list_select_related = ["album"]
     
     form_fields = {
         "title": CharField(max_length=255, description="照片标题", required=False),
@@ -785,7 +719,10 @@ class PhotoModelAdmin(CustomModelAdmin):
         Returns:
             相册名称，如果相册不存在则返回"-"
         """
-        if obj.album:
+        # 列表页通过list_select_related已随照片一起查询出相册，直接读取，避免每行一次查询
+        if isinstance(obj.album, Album):
+            return obj.album.name
+        if obj.album_id:
             album = await Album.get_or_none(id=obj.album_id)
             if album:
                 return album.name
@@ -807,128 +744,6 @@ class PhotoModelAdmin(CustomModelAdmin):
             return f'<img src="{obj.original_url}" height="50" />'
         return "-"
     
-    def ensure_upload_directories(self) -> tuple[str, str, str]:
-        """确保上传目录存在
-        
-        创建照片上传所需的所有目录，包括原图、缩略图和预览图目录
-        
-        Returns:
-            包含上传目录、缩略图目录和预览图目录路径的元组
-        """
-        upload_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos")
-        thumbnails_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos", "thumbnails")
-        previews_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos", "previews")
-        
-        os.makedirs(upload_dir, exist_ok=True)
-        os.makedirs(thumbnails_dir, exist_ok=True)
-        os.makedirs(previews_dir, exist_ok=True)
-        
-        return upload_dir, thumbnails_dir, previews_dir
-    
-    def extract_exif_data(self, image: Image.Image) -> dict:
-        """从图片中提取EXIF数据
-        
-        Args:
-            image: PIL Image对象
-            
-        Returns:
-            包含提取的数据字典（taken_at, latitude, longitude等）
-        """
-        result = {}
-        try:
-            if hasattr(image, '_getexif') and image._getexif() is not None:
-                exif = image._getexif()
-                
-                # 提取拍摄时间
-                if 36867 in exif:  # DateTimeOriginal
-                    from datetime import datetime
-                    import pytz
-                    # 解析EXIF中的时间（通常是本地时间）
-                    taken_at = datetime.strptime(exif[36867], "%Y:%m:%d %H:%M:%S")
-                    # 将时间设置为上海时区
-                    shanghai_tz = pytz.timezone('Asia/Shanghai')
-                    taken_at_shanghai = shanghai_tz.localize(taken_at)
-                    result["taken_at"] = taken_at_shanghai.isoformat()
-                
-                # 提取GPS信息
-                if 34853 in exif:  # GPSInfo
-                    gps_info = exif[34853]
-                    if gps_info:
-                        # 提取纬度
-                        if 2 in gps_info and 1 in gps_info:  # GPSLatitude and GPSLatitudeRef
-                            lat = gps_info[2]
-                            lat_ref = gps_info[1]
-                            if isinstance(lat, (list, tuple)) and len(lat) >= 3:
-                                latitude = lat[0] + lat[1]/60 + lat[2]/3600
-                                if lat_ref == 'S':
-                                    latitude = -latitude
-                                result["latitude"] = latitude
-                        
-                        # 提取经度
-                        if 4 in gps_info and 3 in gps_info:  # GPSLongitude and GPSLongitudeRef
-                            lon = gps_info[4]
-                            lon_ref = gps_info[3]
-                            if isinstance(lon, (list, tuple)) and len(lon) >= 3:
-                                longitude = lon[0] + lon[1]/60 + lon[2]/3600
-                                if lon_ref == 'W':
-                                    longitude = -longitude
-                                result["longitude"] = longitude
-                                
-        except Exception as e:
-            print(f"提取EXIF数据时出错: {str(e)}")
-        
-        return result
-    
-    def process_photo_image(self, image: Image.Image, unique_id: str, upload_dir: str, thumbnails_dir: str, previews_dir: str, width: int, height: int, file_ext: str = '.jpg') -> dict:
-        """处理图片，生成缩略图和预览图，保持横竖比例
-        
-        Args:
-            image: PIL Image对象
-            unique_id: 唯一标识符
-            upload_dir: 上传目录路径
-            thumbnails_dir: 缩略图目录路径
-            previews_dir: 预览图目录路径
-            width: 图片宽度
-            height: 图片高度
-            file_ext: 文件扩展名，默认为.jpg
-            
-        Returns:
-            包含图片处理结果的字典，包括缩略图和预览图URL
-        """
-        result = {}
-        
-        # 首先处理EXIF旋转信息，确保图片方向正确
-        image = ImageOps.exif_transpose(image)
-        
-        # 生成缩略图 (最大边200px，保持横竖比例)
-        # 使用thumbnail方法自动保持比例
-        thumbnail = image.copy()
-        thumbnail.thumbnail((THUMBNAIL_MAX_SIZE, THUMBNAIL_MAX_SIZE), Image.LANCZOS)
-        
-        # 保存缩略图
-        thumbnail_filename = f"{unique_id}_thumbnail.jpg"
-        thumbnail_path = os.path.join(thumbnails_dir, thumbnail_filename)
-        thumbnail.convert("RGB").save(thumbnail_path, "JPEG", quality=85)
-        result["thumbnail_url"] = f"/static/uploads/photos/thumbnails/{thumbnail_filename}"
-        
-        # 生成预览图 (最大边1500px，保持横竖比例)
-        if width > PREVIEW_MAX_SIZE or height > PREVIEW_MAX_SIZE:
-            # 使用thumbnail方法自动保持比例
-            preview = image.copy()
-            preview.thumbnail((PREVIEW_MAX_SIZE, PREVIEW_MAX_SIZE), Image.LANCZOS)
-            
-            # 保存预览图
-            preview_filename = f"{unique_id}_preview.webp"
-            preview_path = os.path.join(previews_dir, preview_filename)
-            preview.save(preview_path, "WEBP", quality=90)
-            result["preview_url"] = f"/static/uploads/photos/previews/{preview_filename}"
-        else:
-            # 如果原图小于预览图尺寸，则使用原图作为预览图
-            # 使用与原始文件相同的扩展名
-            result["preview_url"] = f"/static/uploads/photos/{unique_id}{file_ext}"
-        
-        return result
-
     def create_photo_payload(self, payload: dict, file_type: str = None, content: bytes = None, unique_id: str = None, original_url: str = None, original_filename: str = None) -> dict:
         """创建照片数据载荷
         
@@ -958,10 +773,10 @@ class PhotoModelAdmin(CustomModelAdmin):
         if original_url:
             file_payload["original_url"] = [original_url] if isinstance(original_url, str) else original_url
         elif unique_id and file_type and settings.SAVE_ORIGINAL_PHOTOS:
-            file_payload["original_url"] = [f"/static/uploads/photos/{unique_id}.{file_type}"]
+            file_payload["original_url"] = [f"{PHOTOS_URL}/{unique_id}.{file_type}"]
         else:
             # 当不保存原始文件时，使用默认图片或空值
-            file_payload["original_url"] = ["/static/default.png"]
+            file_payload["original_url"] = [DEFAULT_PHOTO_URL]
         
         # 设置原始文件名
         if original_filename:
@@ -973,29 +788,22 @@ class PhotoModelAdmin(CustomModelAdmin):
         
         # 设置文件格式
         if file_type:
-            try:
-                format_enum = PhotoFormat(file_type)
-                file_payload["file_format"] = format_enum
-            except ValueError:
-                file_payload["file_format"] = PhotoFormat.OTHER
+            file_payload["file_format"] = _PHOTO_FORMATS.get(file_type.lower(), PhotoFormat.OTHER)
         
         return file_payload
 
-    def validate_file_type(self, file_type: str, supported_formats: list = None) -> None:
+    def validate_file_type(self, file_type: str, supported_formats: frozenset = ALLOWED_IMAGE_TYPES) -> None:
         """验证文件类型是否支持
         
         Args:
             file_type: 文件类型
-            supported_formats: 支持的格式列表，如果为None则使用默认列表
+            supported_formats: 支持的格式集合，默认为ALLOWED_IMAGE_TYPES
             
         Raises:
             ValueError: 当文件格式不支持时
         """
-        if supported_formats is None:
-            supported_formats = ["jpg", "jpeg", "png", "gif", "webp", "heic"]
-        
         if file_type.lower() not in supported_formats:
-            raise ValueError(f"不支持的图片格式 {file_type}，仅支持：{', '.join(supported_formats)}")
+            raise ValueError(f"不支持的图片格式 {file_type}，仅支持：{', '.join(sorted(supported_formats))}")
 
     async def process_base64_image(self, base64_str: str, payload: dict) -> dict:
         """处理base64编码的图片
@@ -1010,80 +818,63 @@ class PhotoModelAdmin(CustomModelAdmin):
         Raises:
             ValueError: 当base64数据格式无效或图片格式不支持时
         """
-        print("开始处理base64编码的图片")
-        base64_pattern = r'^data:image/(\w+);base64,(.+)$'
-        match = re.match(base64_pattern, base64_str)
+        logger.debug("开始处理base64编码的图片")
+        parsed = parse_data_uri(base64_str)
         
-        if not match:
+        if not parsed:
             raise ValueError("无效的base64图片数据：数据格式不正确")
         
         # 提取并验证图片格式
-        file_type = match.group(1).lower()
-        base64_data = match.group(2)
+        file_type, base64_data = parsed
+        file_type = file_type.lower()
         
         # 检查文件格式是否支持
         self.validate_file_type(file_type)
         
-        # 生成唯一标识符和文件名
-        unique_id = uuid4().hex
-        file_ext = f".{file_type}"
-        unique_filename = f"{unique_id}{file_ext}"
-        print(f"生成唯一文件名：{unique_filename}")
-        
-        # 确保上传目录存在
-        upload_dir, thumbnails_dir, previews_dir = self.ensure_upload_directories()
+        # 先只解码开头几个字符检查文件头，非图片数据无需解码整个内容
+        if sniff_base64_image_format(base64_data) is None:
+            raise ValueError("无效的base64图片数据：无法识别图片格式")
         
         # 解码并保存base64图片
         try:
-            print("开始解码和保存base64图片")
-            content = base64.b64decode(base64_data)
-            file_path = os.path.join(upload_dir, unique_filename)
-            
-            # 根据配置决定是否保存原始图片文件
-            if settings.SAVE_ORIGINAL_PHOTOS:
-                save_image_file(file_path, content)
-                print(f"原始图片已保存到：{file_path}")
-            else:
-                print("根据配置，跳过保存原始图片文件")
+            logger.debug("开始解码和保存base64图片")
+            # 大图的base64解码和哈希耗时较长，同样放到线程池执行
+            # 以内容哈希作为唯一标识符，重复上传相同图片时复用已保存的原图和已生成的缩略图、预览图
+            unique_id, content = await run_in_image_executor(decode_base64_image, base64_data)
+            file_ext = f".{file_type}"
+            unique_filename = f"{unique_id}{file_ext}"
+            logger.debug("生成唯一文件名：%s", unique_filename)
+            file_path = f"{PHOTOS_DIR}/{unique_filename}"
             
             # 创建并更新图片元数据
             file_payload = self.create_photo_payload(payload, file_type, content, unique_id)
-            print("已更新图片元数据")
-            
-            # 获取图片信息
-            print("开始处理图片信息")
-            image = Image.open(io.BytesIO(content))
-            width, height = image.size
+            logger.debug("已更新图片元数据")
             
-            # 更新图片尺寸信息
-            file_payload["width"] = width
-            file_payload["height"] = height
-            print(f"图片尺寸：{width}x{height}, 文件大小：{len(content)}字节")
-            
-            # 提取EXIF数据
-            exif_data = self.extract_exif_data(image)
-            if exif_data:
-                if "taken_at" in exif_data:
-                    file_payload["taken_at"] = exif_data["taken_at"]
-                if "latitude" in exif_data:
-                    file_payload["latitude"] = exif_data["latitude"]
-                if "longitude" in exif_data:
-                    file_payload["longitude"] = exif_data["longitude"]
-            
-            # 处理图片并生成缩略图和预览图
-            result = self.process_photo_image(image, unique_id, upload_dir, thumbnails_dir, previews_dir, width, height, f".{file_type}")
-            file_payload.update(result)
-            print("已生成缩略图和预览图")
+            # 在线程池中解码图片、提取EXIF并生成缩略图和预览图
+            logger.debug("开始处理图片信息")
+            # 根据配置决定是否保存原始图片文件
+            rendered = await persist_image(
+                content,
+                file_path if settings.SAVE_ORIGINAL_PHOTOS else None,
+                partial(render_photo_image, unique_id=unique_id, file_ext=file_ext),
+            )
+            if settings.SAVE_ORIGINAL_PHOTOS:
+                logger.debug("原始图片已保存到：%s", file_path)
+            else:
+                logger.debug("根据配置，跳过保存原始图片文件")
+            file_payload.update(rendered)
+            logger.debug("图片尺寸：%sx%s, 文件大小：%s字节", file_payload['width'], file_payload['height'], len(content))
+            logger.debug("已生成缩略图和预览图")
             
             # 确保所有必需的URL都已设置
             if not file_payload.get("preview_url"):
                 file_payload["preview_url"] = file_payload["original_url"][0]
-                print("使用原图作为预览图")
+                logger.debug("使用原图作为预览图")
             
             return file_payload
             
         except Exception as e:
-            print(f"处理base64图片时出错: {str(e)}")
+            logger.exception("处理base64图片时出错")
             raise e
 
     async def process_upload_file(self, file: UploadFile, payload: dict) -> dict:
@@ -1099,76 +890,52 @@ class PhotoModelAdmin(CustomModelAdmin):
         Raises:
             ValueError: 当文件格式不支持或处理失败时
         """
-        # 确保上传目录存在
-        upload_dir, thumbnails_dir, previews_dir = self.ensure_upload_directories()
-        
         # 获取文件扩展名并转换为小写
         original_filename = file.filename
-        file_ext = os.path.splitext(original_filename)[1].lower()
+        file_ext = get_file_ext(original_filename)
         
         # 检查文件格式
-        supported_formats = [".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic"]
-        if file_ext not in supported_formats:
+        if file_ext not in ALLOWED_IMAGE_EXTS:
             raise ValueError(f"不支持的图片格式: {file_ext}")
+        check_upload_size(file.size)
         
-        # 生成唯一文件名
-        unique_id = uuid4().hex
-        unique_filename = f"{unique_id}{file_ext}"
-        file_path = os.path.join(upload_dir, unique_filename)
-        
-        # 读取文件内容
-        content = await file.read()
-        
-        # 根据配置决定是否保存原始文件
-        if settings.SAVE_ORIGINAL_PHOTOS:
-            with open(file_path, "wb") as f:
-                f.write(content)
-                f.flush()
-                os.fsync(f.fileno())
-            print(f"原始文件已保存到：{file_path}")
-        else:
-            print("根据配置，跳过保存原始文件")
-        
-        # 创建照片数据载荷
-        file_type = file_ext[1:].lower()  # 去掉点号
-        file_payload = self.create_photo_payload(
-            payload, 
-            file_type, 
-            content, 
-            unique_id, 
-            f"/static/uploads/photos/{unique_filename}", 
-            original_filename
-        )
+        # 先检查文件头，非图片文件无需写盘和交给Pillow解析
+        image_format = sniff_image_format(await file.read(SNIFF_HEADER_SIZE))
+        if image_format is None:
+            logger.warning("无法识别图片格式: %s", original_filename)
+            raise ValueError(f"无法识别图片格式: {original_filename}")
+        await file.seek(0)
         
         try:
-            # 打开图片
-            image = Image.open(io.BytesIO(content))
-            # 获取图片尺寸
-            width, height = image.size
-            file_payload["width"] = width
-            file_payload["height"] = height
-            
-            # 提取EXIF数据
-            exif_data = self.extract_exif_data(image)
-            if exif_data:
-                if "taken_at" in exif_data:
-                    file_payload["taken_at"] = exif_data["taken_at"]
-                if "latitude" in exif_data:
-                    file_payload["latitude"] = exif_data["latitude"]
-                if "longitude" in exif_data:
-                    file_payload["longitude"] = exif_data["longitude"]
+            # 根据配置决定是否保存原始文件，写盘时按内容哈希生成文件名，重复上传时复用已生成的预览图和缩略图；
+            # 随后在线程池中解码图片、提取EXIF并生成缩略图和预览图
+            unique_id, rendered, file_size = await persist_upload(
+                file.file,
+                PHOTOS_DIR if settings.SAVE_ORIGINAL_PHOTOS else None,
+                file_ext,
+                partial(render_photo_image, file_ext=file_ext, image_format=image_format),
+            )
             
-            # 处理图片并生成缩略图和预览图
-            result = self.process_photo_image(image, unique_id, upload_dir, thumbnails_dir, previews_dir, width, height, file_ext)
-            file_payload.update(result)
+            # 创建照片数据载荷
+            file_type = file_ext[1:].lower()  # 去掉点号
+            file_payload = self.create_photo_payload(
+                payload, 
+                file_type, 
+                None, 
+                unique_id, 
+                f"{PHOTOS_URL}/{unique_id}{file_ext}", 
+                original_filename
+            )
+            file_payload["file_size"] = file_size
+            file_payload.update(rendered)
             
             return file_payload
             
         except UnidentifiedImageError:
-            print(f"无法识别图片格式: {original_filename}")
+            logger.warning("无法识别图片格式: %s", original_filename)
             raise ValueError(f"无法识别图片格式: {original_filename}")
         except Exception as e:
-            print(f"处理图片时出错: {str(e)}")
+            logger.exception("处理图片时出错")
             raise ValueError(f"处理图片时出错: {str(e)}")
 
     def process_existing_url(self, url: str, payload: dict) -> dict:
@@ -1183,6 +950,29 @@ class PhotoModelAdmin(CustomModelAdmin):
         """
         return self.create_photo_payload(payload, original_url=url)
 
+    async def process_file(self, file: UploadFile | str, payload: dict) -> dict:
+        """根据文件类型处理单个上传文件
+
+        Args:
+            file: base64图片字符串、上传文件或已有图片URL
+            payload: 原始payload数据
+
+        Returns:
+            处理后的照片数据载荷
+
+        Raises:
+            ValueError: 不支持的文件格式或无效文件
+        """
+        # 处理base64编码的图片
+        if isinstance(file, str) and file.startswith('data:image/'):
+            return await self.process_base64_image(file, payload)
+        if isinstance(file, UploadFile):
+            return await self.process_upload_file(file, payload)
+        if isinstance(file, str) and (file.startswith('/static/uploads/') or file == '/static/default.png'):
+            # 如果是已有图片的URL或默认图片
+            return self.process_existing_url(file, payload)
+        raise ValueError(f"不支持的文件格式或无效文件: {file}")
+
     def normalize_payload(self, payload: dict) -> dict:
         """标准化payload数据
         
@@ -1192,26 +982,8 @@ class PhotoModelAdmin(CustomModelAdmin):
         Returns:
             标准化后的payload数据
         """
-        # 确保original_url是列表类型
-        if "original_url" in payload and isinstance(payload["original_url"], str):
-            payload["original_url"] = [payload["original_url"]]
-            print("格式化：将原图URL转换为列表格式")
-        
-        # 数据预处理完成
-        
-        # 设置默认值
-        if "original_url" not in payload or payload["original_url"] is None:
-            payload["original_url"] = ["/static/default.png"]
-        
-        # 处理预览图和原图URL的关系
-        if "preview_url" in payload and payload["preview_url"] and (
-            not payload["original_url"] or 
-            payload["original_url"] == ["/static/default.png"] or 
-            payload["original_url"] == "/static/default.png"):
-            # 如果有预览图但原图为空或默认值，使用预览图作为原图
-            payload["original_url"] = [payload["preview_url"]]
-            print("图片处理：使用预览图作为原图URL")
-        
+        # 确保original_url是非空列表，没有上传图片时使用预览图或默认图片
+        _normalize_original_url(payload)
         return payload
 
     async def save_model(self, id: UUID | int | None, payload: dict) -> dict | None:
@@ -1233,242 +1005,182 @@ class PhotoModelAdmin(CustomModelAdmin):
             if not payload.get("album"):
                 raise ValueError("所属相册不能为空")
 
-            # 处理现有记录的修改（id存在）
-            if id:
-                existing = await Photo.get_or_none(id=id)
+            # 处理现有记录的修改（id存在）：没有上传图片时才查询现有记录，使用现有的预览图URL
+            if id and (not payload.get("original_url") or payload["original_url"] == [DEFAULT_PHOTO_URL]):
+                existing = await Photo.get_or_none(id=id).only("id", "preview_url")
                 if existing and existing.preview_url:
-                    # 如果原图URL为空或是默认值，使用现有的预览图URL
-                    if not payload.get("original_url") or payload.get("original_url") == [] or payload.get("original_url") == ["/static/default.png"]:
-                        payload["original_url"] = [existing.preview_url]
-                        print(f"修改保存：使用现有预览图作为原图URL: {existing.preview_url}")
+                    payload["original_url"] = [existing.preview_url]
+                    logger.debug("修改保存：使用现有预览图作为原图URL: %s", existing.preview_url)
 
             # 标准化payload数据
             payload = self.normalize_payload(payload)
                 
             # 处理图片文件
             if "original_url" in payload and payload["original_url"] is not None:
-                # 标准化文件列表
+                # 标准化后original_url一定是列表
                 files = payload["original_url"]
-                if not isinstance(files, list):
-                    files = [files]
-                    print("格式化：将文件转换为列表格式")
                 
                 # 如果是多张图片上传，每张图片创建一个新的记录
                 if len(files) > 1 and not id:
-                    results = []
-                    for file in files:
-                        # 为每张图片创建新的payload
-                        single_payload = payload.copy()
-                        single_payload["original_url"] = file
-                        # 递归调用save_model处理单张图片
-                        result = await self.save_model(None, single_payload)
-                        if result:
-                            results.append(result)
-                    return results[0] if results else None
+                    # 并发处理每张图片，再批量写入数据库
+                    file_payloads = await self.process_files(files, payload)
+                    return await self.bulk_save_photos([{**payload, **file_payload} for file_payload in file_payloads])
                 # 处理修改照片时的多图片上传情况
                 elif len(files) > 1 and id:
                     # 当修改现有照片并上传多张图片时，使用第一张图片更新当前照片
                     # 并为其余图片创建新记录
-                    results = []
-                    
-                    # 获取现有照片对象，用于删除旧文件
+                    # 获取现有照片对象，保存成功后再删除旧文件
                     existing_photo = await Photo.get_or_none(id=id)
-                    if existing_photo:
-                        # 删除原图
-                        if existing_photo.original_url:
-                            if isinstance(existing_photo.original_url, list):
-                                for url in existing_photo.original_url:
-                                    if url.startswith('/static/uploads/'):
-                                        # 处理原始图片路径
-                                        file_path = os.path.join(settings.STATIC_DIR, url.replace('/static/', ''))
-                                        if os.path.exists(file_path):
-                                            print(f"删除旧的原始图片文件: {file_path}")
-                                            os.remove(file_path)
-                                        
-                                        # 检查并删除可能存在的原始图片（不带_preview或_thumbnail后缀）
-                                        file_name = os.path.basename(url)
-                                        if "_preview" in file_name or "_thumbnail" in file_name:
-                                            base_name = file_name.split("_")[0]
-                                            photos_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos")
-                                            for f in os.listdir(photos_dir):
-                                                if f.startswith(base_name) and not ("_preview" in f or "_thumbnail" in f):
-                                                    original_file_path = os.path.join(photos_dir, f)
-                                                    if os.path.exists(original_file_path):
-                                                        print(f"删除旧的关联原始图片文件: {original_file_path}")
-                                                        os.remove(original_file_path)
-                            elif isinstance(existing_photo.original_url, str) and existing_photo.original_url.startswith('/static/uploads/'):
-                                # 处理原始图片路径
-                                file_path = os.path.join(settings.STATIC_DIR, existing_photo.original_url.replace('/static/', ''))
-                                if os.path.exists(file_path):
-                                    print(f"删除旧的原始图片文件: {file_path}")
-                                    os.remove(file_path)
-                                
-                                # 检查并删除可能存在的原始图片（不带_preview或_thumbnail后缀）
-                                file_name = os.path.basename(existing_photo.original_url)
-                                if "_preview" in file_name or "_thumbnail" in file_name:
-                                    base_name = file_name.split("_")[0]
-                                    photos_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos")
-                                    for f in os.listdir(photos_dir):
-                                        if f.startswith(base_name) and not ("_preview" in f or "_thumbnail" in f):
-                                            original_file_path = os.path.join(photos_dir, f)
-                                            if os.path.exists(original_file_path):
-                                                print(f"删除旧的关联原始图片文件: {original_file_path}")
-                                                os.remove(original_file_path)
-                        
-                        # 删除缩略图
-                        if existing_photo.thumbnail_url and existing_photo.thumbnail_url.startswith('/static/uploads/'):
-                            thumbnail_path = os.path.join(settings.STATIC_DIR, existing_photo.thumbnail_url.replace('/static/', ''))
-                            if os.path.exists(thumbnail_path):
-                                print(f"删除旧的缩略图文件: {thumbnail_path}")
-                                os.remove(thumbnail_path)
-                        
-                        # 删除预览图
-                        if existing_photo.preview_url and existing_photo.preview_url.startswith('/static/uploads/'):
-                            preview_path = os.path.join(settings.STATIC_DIR, existing_photo.preview_url.replace('/static/', ''))
-                            if os.path.exists(preview_path):
-                                print(f"删除旧的预览图文件: {preview_path}")
-                                os.remove(preview_path)
-                    
-                    # 处理第一张图片 - 更新当前照片
-                    first_file = files[0]
-                    single_payload = payload.copy()
-                    single_payload["original_url"] = first_file
-                    
-                    # 处理第一张图片
-                    if isinstance(first_file, str) and first_file.startswith('data:image/'):
-                        file_payload = await self.process_base64_image(first_file, single_payload)
-                        payload.update(file_payload)  # 更新当前照片的payload
-                    elif isinstance(first_file, UploadFile):
-                        file_payload = await self.process_upload_file(first_file, single_payload)
-                        payload.update(file_payload)  # 更新当前照片的payload
-                    elif isinstance(first_file, str) and (first_file.startswith('/static/uploads/') or first_file == '/static/default.png'):
-                        file_payload = self.process_existing_url(first_file, single_payload)
-                        payload.update(file_payload)  # 更新当前照片的payload
-                    
-                    # 为剩余图片创建新记录
-                    for file in files[1:]:
-                        new_payload = payload.copy()
-                        new_payload["original_url"] = file
-                        # 递归调用save_model处理单张图片，创建新记录
-                        result = await self.save_model(None, new_payload)
-                        if result:
-                            results.append(result)
                     
-                    # 保存当前照片并返回结果
-                    print(f"即将保存修改后的照片数据: {payload}")
-                    result = await super().save_model(id, payload)
-                    
-                    # 保存后验证并修复 - 确保 original_url 真的被保存到数据库
-                    if result and "id" in result:
-                        saved_photo = await self.model.get(id=result["id"])
-                        print(f"保存后的photo.original_url: {saved_photo.original_url}, photo.preview_url: {saved_photo.preview_url}")
+                    # 所有图片并发处理，第一张图片更新当前照片，其余图片批量创建新记录
+                    first_payload, *file_payloads = await self.process_files(files, payload)
+                    payload.update(first_payload)
+                    try:
+                        await self.bulk_save_photos([{**payload, **file_payload} for file_payload in file_payloads])
+                        
+                        # 与批量保存一致，使用预览图作为原图URL，随其他字段一次写入
+                        _normalize_original_url(payload, prefer_preview=True)
                         
-                        # 如果保存后 original_url 为空或默认值，但有 preview_url，直接更新数据库
-                        if saved_photo.preview_url and (
-                            not saved_photo.original_url or
-                            saved_photo.original_url == [] or
-                            saved_photo.original_url == ["/static/default.png"] or
-                            saved_photo.original_url == "/static/default.png"
-                        ):
-                            saved_photo.original_url = [saved_photo.preview_url]
-                            await saved_photo.save()
-                            print(f"保存后修复: 更新了 photo.original_url 为 {saved_photo.original_url}")
+                        # 保存当前照片
+                        logger.debug("即将保存修改后的照片数据: %s", payload)
+                        result = await super().save_model(id, payload)
+                    except Exception:
+                        # 当前照片仍引用旧文件，只删除第一张图片新生成的文件
+                        await self.delete_unsaved_photo_files([first_payload])
+                        raise
                     
+                    if existing_photo:
+                        # 删除旧的原图、缩略图和预览图，与其他照片共用的文件保留；
+                        # 旧文件按未保存的照片查询引用，新图片与旧图片内容相同时当前照片仍引用这些文件
+                        await self.delete_unsaved_photo_files([{
+                            "original_url": existing_photo.original_url,
+                            "thumbnail_url": existing_photo.thumbnail_url,
+                            "preview_url": existing_photo.preview_url,
+                        }])
                     return result
                 
-                processed_files = []
-                for file in files:
-                    # 处理base64编码的图片
-                    if isinstance(file, str) and file.startswith('data:image/'):
-                        file_payload = await self.process_base64_image(file, payload)
-                        processed_files.append(file_payload)
-                    elif isinstance(file, UploadFile):
-                        file_payload = await self.process_upload_file(file, payload)
-                        processed_files.append(file_payload)
-                    elif isinstance(file, str) and (file.startswith('/static/uploads/') or file == '/static/default.png'):
-                        # 如果是已有图片的URL或默认图片
-                        file_payload = self.process_existing_url(file, payload)
-                        processed_files.append(file_payload)
-                    else:
-                        raise ValueError(f"不支持的文件格式或无效文件: {file}")
+                # 并发处理每个文件，图片解码和缩放在线程池中执行
+                processed_files = await self.process_files(files, payload)
                 
                 # 如果是多文件上传，创建多个照片记录
                 if len(processed_files) > 1:
-                    results = []
-                    for file_payload in processed_files:
-                        try:
-                            # 确保必需字段存在
-                            if not file_payload.get("original_url"):
-                                if "preview_url" in file_payload and file_payload["preview_url"]:
-                                    file_payload["original_url"] = [file_payload["preview_url"]]
-                                else:
-                                    file_payload["original_url"] = ["/static/default.png"]
-                            
-                            if not file_payload.get("album"):
-                                raise ValueError("缺少必需字段：album")
-                            
-                            print(f"保存照片: {file_payload}")
-                            result = await super().save_model(None, file_payload)
-                            if result:
-                                results.append(result)
-                        except Exception as e:
-                            print(f"保存照片记录时出错: {str(e)}")
-                            raise e
-                    return results[0] if results else None
+                    return await self.bulk_save_photos(processed_files)
                 elif len(processed_files) == 1:
                     # 单文件上传，更新原始payload
                     file_payload = processed_files[0]
                     # 确保必需字段存在
-                    if not file_payload.get("original_url"):
-                        if "preview_url" in file_payload and file_payload["preview_url"]:
-                            file_payload["original_url"] = [file_payload["preview_url"]]
-                        else:
-                            file_payload["original_url"] = ["/static/default.png"]
-                    
                     if not file_payload.get("album"):
                         raise ValueError("缺少必需字段：album")
                     
                     # 更新payload
                     payload.update(file_payload)
             
-            # 保存前再次确保important字段有值
-            if not payload.get("original_url"):
-                # 如果有预览图但没有原图，使用预览图作为原图
-                if "preview_url" in payload and payload["preview_url"]:
-                    payload["original_url"] = [payload["preview_url"]]
-                else:
-                    payload["original_url"] = ["/static/default.png"]
+            # 与批量保存一致，使用预览图作为原图URL，随其他字段一次写入
+            _normalize_original_url(payload, prefer_preview=True)
             
-            print(f"即将保存数据: {payload}")
+            logger.debug("即将保存数据: %s", payload)
             
             # 保存照片
             try:
-                result = await super().save_model(id, payload)
-                
-                # 保存后验证并修复 - 确保 original_url 真的被保存到数据库
-                if result and "id" in result:
-                    saved_photo = await self.model.get(id=result["id"])
-                    print(f"保存后的photo.original_url: {saved_photo.original_url}, photo.preview_url: {saved_photo.preview_url}")
-                    
-                    # 如果保存后 original_url 为空或默认值，但有 preview_url，直接更新数据库
-                    if saved_photo.preview_url and (
-                        not saved_photo.original_url or
-                        saved_photo.original_url == [] or
-                        saved_photo.original_url == ["/static/default.png"] or
-                        saved_photo.original_url == "/static/default.png"
-                    ):
-                        saved_photo.original_url = [saved_photo.preview_url]
-                        await saved_photo.save()
-                        print(f"保存后修复: 更新了 photo.original_url 为 {saved_photo.original_url}")
-                
-                return result
+                return await super().save_model(id, payload)
             except Exception as e:
-                print(f"保存照片记录时出错: {str(e)}")
+                logger.exception("保存照片记录时出错")
                 raise e
         except Exception as e:
-            print(f"保存照片时出错: {str(e)}")
+            logger.exception("保存照片时出错")
             raise e
 
+    async def bulk_save_photos(self, file_payloads: list[dict]) -> dict | None:
+        """批量创建照片记录
+
+        第一张照片走常规save_model以获得主键和序列化结果（bulk_create在SQLite/MySQL上不回填主键），
+        其余照片通过一次bulk_create多行INSERT写入，代替逐条保存的N次数据库往返
+
+        Args:
+            file_payloads: 已处理完图片的照片数据载荷列表
+
+        Returns:
+            第一条照片记录的数据字典，列表为空时返回None
+
+        Raises:
+            ValueError: 缺少所属相册时
+        """
+        if not file_payloads:
+            return None
+
+        for file_payload in file_payloads:
+            # 确保必需字段存在
+            if not file_payload.get("album"):
+                raise ValueError("缺少必需字段：album")
+
+            # 使用预览图作为原图URL，与单张保存一致
+            _normalize_original_url(file_payload, prefer_preview=True)
+
+        # 所有记录在同一个事务中写入，任何一条失败都整体回滚
+        try:
+            async with in_transaction():
+                result = await super().save_model(None, file_payloads[0])
+
+                fields = self.get_model_fields_with_widget_types(with_m2m=False, with_upload=False)
+                photos = []
+                for file_payload in file_payloads[1:]:
+                    photo = self.model(**{
+                        field.column_name: self.deserialize_value(field, file_payload[field.name])
+                        for field in fields
+                        if field.name in file_payload
+                    })
+                    # original_url是上传控件字段，不在上面的普通字段中
+                    photo.original_url = file_payload["original_url"]
+                    photos.append(photo)
+                if photos:
+                    await self.model.bulk_create(photos, batch_size=100)
+        except Exception:
+            # 记录已回滚，删除本批次刚生成的图片文件
+            await self.delete_unsaved_photo_files(file_payloads)
+            raise
+
+        return result
+
+    async def process_files(self, files: list, payload: dict) -> list[dict]:
+        """并发处理多张图片，图片解码和缩放在线程池中执行
+
+        任何一张图片处理失败时，先删除其余图片已生成的文件，再抛出第一个异常
+
+        Args:
+            files: 上传的文件对象或base64字符串列表
+            payload: 照片数据载荷
+
+        Returns:
+            与files顺序一致的照片数据载荷列表
+        """
+        results = await asyncio.gather(*(
+            self.process_file(file, payload) for file in files
+        ), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            await self.delete_unsaved_photo_files([result for result in results if not isinstance(result, BaseException)])
+            raise errors[0]
+        return results
+
+    async def delete_unsaved_photo_files(self, file_payloads: list[dict]) -> None:
+        """删除没有保存到数据库的照片载荷对应的图片文件，与已有照片共用的文件保留
+
+        Args:
+            file_payloads: 包含original_url、thumbnail_url和preview_url的照片数据载荷列表
+        """
+        # 未保存的照片没有主键，数据库中引用同一缩略图的任何照片都会保留这些文件
+        photos = [
+            self.model(
+                original_url=file_payload.get("original_url"),
+                thumbnail_url=file_payload.get("thumbnail_url"),
+                preview_url=file_payload.get("preview_url"),
+            )
+            for file_payload in file_payloads
+            if file_payload.get("thumbnail_url")
+        ]
+        paths = await run_in_image_executor(collect_photo_file_paths, photos)
+        await delete_files(await exclude_shared_photo_files(paths, photos))
+
     async def delete_model(self, id: str) -> bool:
         """删除照片及其关联的所有图片文件
         
@@ -1482,95 +1194,15 @@ class PhotoModelAdmin(CustomModelAdmin):
             # 获取照片对象
             photo = await self.model.get(id=id)
             
-            # 删除原图
-            if photo.original_url:
-                if isinstance(photo.original_url, list):
-                    for url in photo.original_url:
-                        if url.startswith('/static/uploads/'):
-                            # 处理原始图片路径
-                            file_path = os.path.join(settings.STATIC_DIR, url.replace('/static/', ''))
-                            if os.path.exists(file_path):
-                                print(f"删除旧的原始图片文件: {file_path}")
-                                os.remove(file_path)
-                            
-                            # 检查并删除可能存在的原始图片（不带_preview或_thumbnail后缀）
-                            # 从URL中提取文件名部分
-                            file_name = os.path.basename(url)
-                            # 检查是否包含_preview或_thumbnail
-                            if "_preview" in file_name or "_thumbnail" in file_name:
-                                # 提取基本文件名（不含后缀）
-                                base_name = file_name.split("_")[0]
-                                # 构建可能的原始文件路径
-                                photos_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos")
-                                # 查找匹配的原始文件
-                                for f in os.listdir(photos_dir):
-                                    if f.startswith(base_name) and not ("_preview" in f or "_thumbnail" in f):
-                                        original_file_path = os.path.join(photos_dir, f)
-                                        if os.path.exists(original_file_path):
-                                            print(f"删除关联的原始图片文件: {original_file_path}")
-                                            os.remove(original_file_path)
-                elif isinstance(photo.original_url, str) and photo.original_url.startswith('/static/uploads/'):
-                    # 处理原始图片路径
-                    file_path = os.path.join(settings.STATIC_DIR, photo.original_url.replace('/static/', ''))
-                    if os.path.exists(file_path):
-                        print(f"删除旧的原始图片文件: {file_path}")
-                        os.remove(file_path)
-                    
-                    # 检查并删除可能存在的原始图片（不带_preview或_thumbnail后缀）
-                    file_name = os.path.basename(photo.original_url)
-                    if "_preview" in file_name or "_thumbnail" in file_name:
-                        base_name = file_name.split("_")[0]
-                        photos_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos")
-                        for f in os.listdir(photos_dir):
-                            if f.startswith(base_name) and not ("_preview" in f or "_thumbnail" in f):
-                                original_file_path = os.path.join(photos_dir, f)
-                                if os.path.exists(original_file_path):
-                                    print(f"删除关联的原始图片文件: {original_file_path}")
-                                    os.remove(original_file_path)
-                
-                # 检查并删除可能存在的原始图片
-                file_name = os.path.basename(photo.thumbnail_url)
-                if "_thumbnail" in file_name:
-                    base_name = file_name.split("_")[0]
-                    photos_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos")
-                    for f in os.listdir(photos_dir):
-                        if f.startswith(base_name) and not ("_preview" in f or "_thumbnail" in f):
-                            original_file_path = os.path.join(photos_dir, f)
-                            if os.path.exists(original_file_path):
-                                print(f"删除关联的原始图片文件: {original_file_path}")
-                                os.remove(original_file_path)
-            
-            # 删除缩略图
-            if photo.thumbnail_url and photo.thumbnail_url.startswith('/static/uploads/'):
-                thumbnail_path = os.path.join(settings.STATIC_DIR, photo.thumbnail_url.replace('/static/', ''))
-                if os.path.exists(thumbnail_path):
-                    print(f"删除缩略图文件: {thumbnail_path}")
-                    os.remove(thumbnail_path)
-            
-            # 删除预览图
-            if photo.preview_url and photo.preview_url.startswith('/static/uploads/'):
-                preview_path = os.path.join(settings.STATIC_DIR, photo.preview_url.replace('/static/', ''))
-                if os.path.exists(preview_path):
-                    print(f"删除预览图文件: {preview_path}")
-                    os.remove(preview_path)
-                
-                # 检查并删除可能存在的原始图片
-                file_name = os.path.basename(photo.preview_url)
-                if "_preview" in file_name:
-                    base_name = file_name.split("_")[0]
-                    photos_dir = os.path.join(settings.STATIC_DIR, "uploads", "photos")
-                    for f in os.listdir(photos_dir):
-                        if f.startswith(base_name) and not ("_preview" in f or "_thumbnail" in f):
-                            original_file_path = os.path.join(photos_dir, f)
-                            if os.path.exists(original_file_path):
-                                print(f"删除关联的原始图片文件: {original_file_path}")
-                                os.remove(original_file_path)
+            # 删除原图、缩略图、预览图以及预览图对应的原图，与其他照片共用的文件保留
+            paths = await run_in_image_executor(collect_photo_file_paths, [photo])
+            await delete_files(await exclude_shared_photo_files(paths, [photo]))
             
             # 删除照片记录
             return await super().delete_model(id)
             
         except Exception as e:
-            print(f"删除照片及其关联的所有图片文件时出错: {str(e)}")
+            logger.exception("删除照片及其关联的所有图片文件时出错")
             raise e
 
     async def to_dict(self, **kwargs) -> dict:
@@ -1583,4 +1215,4 @@ class PhotoModelAdmin(CustomModelAdmin):
         """
         # 先获取原始数据字典
         data = await super().to_dict(**kwargs)
-        print(f"to_dict 原始数据字典: {data}")
\ No newline at end of file
+        logger.debug("to_dict 原始数据字典: %s", data)
\ No newline at end of file
@@ -1,24 +1,34 @@
 from tortoise.queryset import Q
 from tortoise.functions import Count
 from typing import List, Optional, Dict, Any, Union
-import os
 
 from apps.albums.models import Album, Photo, AlbumCategory
 from apps.albums.schemas import AlbumCreate, AlbumUpdate, PhotoCreate, PhotoUpdate, CategoryCreate, CategoryUpdate
 
 
+def cover_thumbnail_url(album: Album) -> str:
+    """获取上传封面的缩略图URL
+    
+    上传封面时把缩略图URL保存在cover_thumbnail_url字段中；该字段之前上传的封面缩略图都是JPEG，
+    按封面URL推导：封面URL是预览图（小图时为原图），文件名以唯一标识符开头，缩略图为<唯一标识符>_thumbnail.jpg
+    """
+    if album.cover_thumbnail_url:
+        return album.cover_thumbnail_url
+    directory, _, filename = album.cover_image.rpartition('/')
+    unique_id = filename.split('_')[0].partition('.')[0]
+    return f"{directory}/{unique_id}_thumbnail.jpg"
+
+
 def generate_album_urls(album: Album) -> None:
     """为相册生成缩略图和预览图URL"""
     if album.cover_image:
         # 基于封面图片生成缩略图和预览图URL
         cover_path = album.cover_image
         if cover_path.startswith('/static/uploads/'):
-            # 提取文件名（不含扩展名）
-            filename = os.path.splitext(cover_path)[0]
-            # 生成缩略图URL (添加_thumbnail.jpg后缀，与admin.py中的命名一致)
-            album.thumbnail_url = f"{filename}_thumbnail.jpg"
-            # 生成预览图URL (添加_preview.webp后缀，与admin.py中的命名一致)
-            album.preview_url = f"{filename}_preview.webp"
+            # 生成缩略图URL (与admin.py中的命名一致)
+            album.thumbnail_url = cover_thumbnail_url(album)
+            # 封面保存的就是预览图URL（小图没有单独的预览图，保存的是原图URL）
+            album.preview_url = cover_path
         else:
             # 如果不是标准上传路径，使用原图作为缩略图和预览图
             album.thumbnail_url = cover_path
@@ -128,7 +138,11 @@ async def update_album(album_id: int, album_data: AlbumUpdate) -> Optional[Album
     
     update_data = album_data.dict(exclude_unset=True, exclude_none=True)
     if update_data:
+        # 直接修改封面URL时原来的缩略图URL不再对应，改为按封面URL推导
+        if "cover_image" in update_data:
+            update_data["cover_thumbnail_url"] = None
         await album.update_from_dict(update_data).save()
+        generate_album_urls(album)
     
     return album
 
@@ -0,0 +1,887 @@
+"""相册图片处理流程
+
+封面和照片上传共用的图片处理函数：识别格式、解析base64 data URI、解码、
+生成预览图和缩略图、保存原图以及提取EXIF信息。
+这些函数只依赖图片数据和目录参数，不涉及数据库和管理后台
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+from typing import Any, BinaryIO, Callable, Collection, Dict, Iterator, Optional, Tuple, Union
+
+from PIL import Image, ImageOps, features
+
+from core.settings import settings
+
+try:
+    # pybase64基于libbase64，使用SIMD指令加速解码
+    from pybase64 import b64decode
+except ImportError:  # 未安装pybase64时使用标准库
+    from base64 import b64decode
+
+try:
+    import piexif
+except ImportError:  # 未安装piexif时回退到Pillow解析EXIF
+    piexif = None
+
+try:
+    # pyvips基于libvips，解码时直接按目标尺寸缩小（shrink-on-load）并流式处理，不生成全分辨率位图
+    import pyvips
+except (ImportError, OSError):  # 未安装pyvips或缺少libvips动态库时使用Pillow生成缩略图和预览图
+    pyvips = None
+
+logger = logging.getLogger(__name__)
+
+# JPEG的解码（含draft缩小）和编码由Pillow链接的libjpeg-turbo完成，IDCT、颜色转换等都有SIMD加速，
+# 无需再引入PyTurboJPEG；官方wheel均链接libjpeg-turbo，源码编译的Pillow(-SIMD)可能链接到普通libjpeg
+if features.check_codec("jpg") and not features.check_feature("libjpeg_turbo"):
+    logger.warning("Pillow未链接libjpeg-turbo，JPEG解码和编码没有SIMD加速")
+
+# 图片解码、缩放、编码和写盘使用的线程池，大小与CPU核数一致。
+# Pillow和libvips处理时释放GIL，多个上传可以在多核上并行；线程数超过核数只会增加同时解码的图片和内存占用
+_IMAGE_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="image")
+# 可选的图片处理进程池，IMAGE_PROCESS_WORKERS大于0时缩略图和预览图在子进程中生成，Python层的处理也能用满多核。
+# 默认不启用：gunicorn已按CPU核数启动多个工作进程，每个进程再开进程池只会成倍增加进程数和内存占用。
+# 使用spawn启动子进程，避免fork时复制父进程中其他线程持有的锁；子进程在第一次提交任务时才创建
+_IMAGE_PROCESS_POOL = (
+    ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    if settings.IMAGE_PROCESS_WORKERS > 0
+    else None
+)
+
+# 预览图最大尺寸常量
+PREVIEW_MAX_SIZE = 1500
+# 缩略图最大尺寸常量
+THUMBNAIL_MAX_SIZE = 200
+
+# 常见图片格式的文件头签名
+_IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+# HEIC/HEIF容器ftyp box中的品牌标识
+_HEIF_BRANDS = (b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1")
+# 缩略图编码格式对应的文件扩展名
+THUMBNAIL_EXTS = {"JPEG": ".jpg", "WEBP": ".webp"}
+# 支持的图片类型和扩展名，frozenset哈希查找，每次请求无需重新构造列表
+ALLOWED_IMAGE_TYPES = frozenset({"jpeg", "jpg", "png", "gif", "webp", "heic"})
+ALLOWED_IMAGE_EXTS = frozenset({".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic"})
+# 缩略图各编码格式对应的扩展名和保存参数，JPEG的质量、Huffman优化和渐进式编码由配置决定，使用4:2:0色度抽样
+_THUMBNAIL_SAVE_OPTIONS = {
+    "JPEG": (THUMBNAIL_EXTS["JPEG"], {
+        "quality": settings.THUMBNAIL_JPEG_QUALITY,
+        "optimize": settings.THUMBNAIL_JPEG_OPTIMIZE,
+        "progressive": settings.THUMBNAIL_JPEG_PROGRESSIVE,
+        "subsampling": 2,
+    }),
+    "WEBP": (THUMBNAIL_EXTS["WEBP"], {"quality": 80, "method": 4}),
+}
+# 使用pyvips时缩略图各编码格式的保存参数，编码格式由文件扩展名决定；与Pillow生成的一致，不写入EXIF等元数据
+_VIPS_THUMBNAIL_SAVE_OPTIONS = {
+    "JPEG": {
+        "Q": settings.THUMBNAIL_JPEG_QUALITY,
+        "optimize_coding": settings.THUMBNAIL_JPEG_OPTIMIZE,
+        "interlace": settings.THUMBNAIL_JPEG_PROGRESSIVE,
+        "subsample_mode": "on",
+        "strip": True,
+    },
+    "WEBP": {"Q": 80, "effort": 4, "strip": True},
+}
+# 预览图和缩略图的缩放滤镜。JPEG经draft在解码时已完成大部分缩小，BICUBIC与LANCZOS肉眼几乎无差别，
+# 卷积核更窄，每个输出像素的乘加次数更少；安装Pillow-SIMD后两者都有AVX2加速
+try:
+    _RESAMPLE = Image.Resampling[settings.IMAGE_RESAMPLING.upper()]
+except KeyError:
+    logger.warning("未知的缩放滤镜配置IMAGE_RESAMPLING=%s，使用bicubic", settings.IMAGE_RESAMPLING)
+    _RESAMPLE = Image.Resampling.BICUBIC
+# 缩小倍数超过2倍时先用reduce按整数倍做快速盒式缩小，再用上面的滤镜缩放剩余部分，
+# 非JPEG图片（PNG、WebP等）无法draft，主要靠这一步减少卷积计算量
+_REDUCING_GAP = 2.0
+# 上传文件写盘时每次复制的块大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# 开启UPLOAD_FSYNC时使用fdatasync只同步文件数据，跳过访问时间等元数据的同步；不支持的平台（macOS、Windows）回退到fsync
+_sync_file = getattr(os, "fdatasync", os.fsync)
+# 识别图片格式需要读取的文件头字节数
+SNIFF_HEADER_SIZE = 12
+# 文件头识别出的格式对应的Pillow解码器，HEIC依赖第三方插件注册，不限定解码器
+_PIL_FORMATS = {"jpeg": ("JPEG",), "png": ("PNG",), "gif": ("GIF",), "webp": ("WEBP",)}
+
+# base64图片data URI前缀：data:image/<类型>;base64,<数据>
+_DATA_URI_PREFIX = "data:image/"
+_DATA_URI_BASE64_SUFFIX = ";base64"
+# 识别格式时只解码base64数据开头的字符数，每4个字符对应3个字节
+_BASE64_HEADER_CHARS = SNIFF_HEADER_SIZE // 3 * 4
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    """将图片转换为RGB模式，已是RGB时直接返回原对象，避免多余的像素拷贝
+
+    带透明通道的图片先合成到白色背景上，直接丢弃透明通道会让透明区域显示为黑色或杂色
+    """
+    if image.mode == "RGB":
+        return image
+    if image.mode in ("LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+    if image.mode == "RGBA":
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def check_upload_size(size: Optional[int]) -> None:
+    """检查上传图片的字节数，超过MAX_IMAGE_UPLOAD_SIZE时在写盘和解码前直接拒绝
+
+    Args:
+        size: 文件字节数，未知时为None，不做检查
+
+    Raises:
+        ValueError: 文件过大时
+    """
+    if size is not None and size > settings.MAX_IMAGE_UPLOAD_SIZE:
+        raise ValueError(f"图片文件过大: {size}字节，最大允许{settings.MAX_IMAGE_UPLOAD_SIZE}字节")
+
+
+def _read_upload_chunks(source: BinaryIO) -> Iterator[bytes]:
+    """按块读取上传文件并统计实际读取的字节数，超过MAX_IMAGE_UPLOAD_SIZE时立即停止
+
+    分块传输的请求没有Content-Length，UploadFile.size为None，check_upload_size无法提前拒绝，
+    以实际读取的字节数为准，超限后不再继续哈希或写盘
+
+    Raises:
+        ValueError: 文件过大时
+    """
+    total = 0
+    while chunk := source.read(UPLOAD_CHUNK_SIZE):
+        total += len(chunk)
+        if total > settings.MAX_IMAGE_UPLOAD_SIZE:
+            raise ValueError(f"图片文件过大: 超过{settings.MAX_IMAGE_UPLOAD_SIZE}字节")
+        yield chunk
+
+
+def _check_image_pixels(size: Tuple[int, int]) -> None:
+    """检查文件头中的图片尺寸，像素数超过MAX_IMAGE_PIXELS时在分配像素内存前拒绝
+
+    Raises:
+        ValueError: 像素数过多时
+    """
+    width, height = size
+    if width * height > settings.MAX_IMAGE_PIXELS:
+        raise ValueError(f"图片像素过多: {width}x{height}，最多允许{settings.MAX_IMAGE_PIXELS}像素")
+
+
+def _open_image(source: Union[bytes, str], image_format: Optional[str] = None, decode: bool = True) -> Tuple[Image.Image, Tuple[int, int]]:
+    """从字节数据或文件路径打开并立即解码图片
+
+    JPEG图片通过draft让libjpeg在解码时直接按1/2、1/4、1/8缩小到不小于预览图（没有预览图时为缩略图）的尺寸，
+    减少IDCT计算量和像素内存。已知格式只交给对应的解码器，跳过Pillow逐个插件试探文件头的过程。
+    解码完成后关闭文件，像素数据保留在Pillow的C缓冲区中
+
+    Args:
+        source: 图片文件内容，或已保存到磁盘的图片路径
+        image_format: 文件头识别出的格式，为None时根据字节数据识别
+        decode: 是否解码像素；为False时只解析文件头，返回的Image对象仅可读取尺寸和EXIF
+
+    Returns:
+        (已解码的PIL Image对象, 原图尺寸) 元组，draft后image.size可能小于原图尺寸
+
+    Raises:
+        ValueError: 图片像素过多时
+    """
+    if isinstance(source, bytes):
+        image_format = image_format or sniff_image_format(source)
+        fp = io.BytesIO(source)
+    else:
+        fp = open(source, "rb")
+    with fp:
+        image = Image.open(fp, formats=_PIL_FORMATS.get(image_format))
+        original_size = image.size
+        _check_image_pixels(original_size)
+        if decode:
+            if image.format == "JPEG":
+                # 不需要预览图的小图只生成缩略图，按缩略图尺寸缩小即可
+                draft_size = PREVIEW_MAX_SIZE if max(original_size) > PREVIEW_MAX_SIZE else THUMBNAIL_MAX_SIZE
+                image.draft("RGB", (draft_size, draft_size))
+            image.load()
+    return image, original_size
+
+
+def open_image(source: Union[bytes, str], image_format: Optional[str] = None, decode: bool = True) -> Tuple[Image.Image, Tuple[int, int]]:
+    """打开图片用于生成缩略图和预览图
+
+    安装了pyvips时缩略图和预览图由libvips直接从原始数据生成，只需解析文件头；否则立即解码
+
+    Args:
+        source: 图片文件内容，或原图文件路径
+        image_format: 文件头识别出的格式，为None时自动识别
+        decode: 为False时只解析文件头，由generate_derivatives在需要时再从source解码
+
+    Returns:
+        (Image对象, 原图尺寸)
+    """
+    return _open_image(source, image_format, decode=decode and pyvips is None)
+
+
+def content_id(content: bytes) -> str:
+    """根据图片内容计算唯一标识符
+
+    BLAKE2b生成的128位摘要与uuid4().hex同为32个十六进制字符。
+    相同内容得到相同的标识符，重复上传时可直接复用已生成的原图、预览图和缩略图
+
+    Args:
+        content: 图片文件内容
+
+    Returns:
+        十六进制摘要字符串
+    """
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def decode_base64_image(base64_data: memoryview) -> Tuple[str, bytes]:
+    """解码base64图片数据并计算内容标识符，由调用方放到线程池执行
+
+    Args:
+        base64_data: data URI中的base64部分
+
+    Returns:
+        (内容标识符, 图片文件内容) 元组
+
+    Raises:
+        ValueError: base64数据无效或图片文件过大时
+    """
+    # 每4个base64字符对应3个字节，按编码长度估算文件大小；data URI此时已整体接收在内存中，过大时只省去解码和后续处理
+    check_upload_size(len(base64_data) // 4 * 3)
+    content = b64decode(base64_data, validate=True)
+    return content_id(content), content
+
+
+def sniff_image_format(content: bytes) -> Optional[str]:
+    """根据文件头字节识别图片格式，无需调用Pillow解析
+
+    Args:
+        content: 图片文件内容（至少包含前12个字节）
+
+    Returns:
+        识别出的格式（jpeg/png/gif/webp/heic），无法识别时返回None
+    """
+    for signature, image_format in _IMAGE_SIGNATURES:
+        if content.startswith(signature):
+            return image_format
+    if content[:4] == b"RIFF" and content[8:12] == b"WEBP":
+        return "webp"
+    if content[4:8] == b"ftyp" and content[8:12] in _HEIF_BRANDS:
+        return "heic"
+    return None
+
+
+def sniff_base64_image_format(base64_data: memoryview) -> Optional[str]:
+    """只解码base64数据开头的几个字符识别图片格式，非图片数据无需解码整个内容即可拒绝
+
+    Args:
+        base64_data: data URI中逗号之后的base64数据
+
+    Returns:
+        识别出的格式，无法识别或不是合法base64时返回None
+    """
+    try:
+        header = b64decode(base64_data[:_BASE64_HEADER_CHARS], validate=True)
+    except ValueError:
+        return None
+    return sniff_image_format(header)
+
+
+def parse_data_uri(data_uri: str) -> Optional[Tuple[str, memoryview]]:
+    """拆分base64图片data URI
+
+    只用前缀判断和str.find定位头部与数据的分隔，避免正则表达式在数MB的base64数据上匹配和捕获。
+    整个字符串只编码一次为ASCII字节，base64数据以memoryview切片返回，不再复制一份数据部分的字符串
+
+    Args:
+        data_uri: 形如data:image/<类型>;base64,<数据>的字符串
+
+    Returns:
+        (图片类型, base64数据) 元组，格式不正确时返回None
+    """
+    if not data_uri.startswith(_DATA_URI_PREFIX):
+        return None
+    comma = data_uri.find(",")
+    if comma < 0 or comma == len(data_uri) - 1:
+        return None
+    header = data_uri[:comma]
+    if not header.endswith(_DATA_URI_BASE64_SUFFIX):
+        return None
+    file_type = header[len(_DATA_URI_PREFIX):-len(_DATA_URI_BASE64_SUFFIX)]
+    if not file_type.isalnum():
+        return None
+    try:
+        encoded = data_uri.encode("ascii")
+    except UnicodeEncodeError:  # base64数据只能是ASCII字符
+        return None
+    return file_type, memoryview(encoded)[comma + 1:]
+
+
+def _fit_size(size: Tuple[int, int], max_side: int) -> Tuple[int, int]:
+    """计算等比缩放到最大边不超过max_side的尺寸，与Image.thumbnail一样不放大图片
+
+    Args:
+        size: 原始尺寸 (宽, 高)
+        max_side: 最大边长
+
+    Returns:
+        缩放后的尺寸 (宽, 高)
+    """
+    width, height = size
+    if width <= max_side and height <= max_side:
+        return width, height
+    # 整数运算四舍五入，长边固定为max_side
+    if width >= height:
+        return max_side, max(1, (height * max_side + width // 2) // width)
+    return max(1, (width * max_side + height // 2) // height), max_side
+
+
+def generate_derivatives(
+    image: Image.Image,
+    unique_id: str,
+    width: int,
+    height: int,
+    file_ext: str,
+    *,
+    original_url: str,
+    previews_dir: str,
+    previews_url: str,
+    thumbnails_dir: str,
+    thumbnails_url: str,
+    thumbnail_format: str = "JPEG",
+    source: Union[bytes, str, None] = None,
+) -> Dict[str, Any]:
+    """生成预览图和缩略图，保持横竖比例，相册封面和照片共用
+
+    提供了原始数据时image只需解析文件头：安装了pyvips时由libvips直接从原始数据生成，
+    否则在确实需要生成时才从原始数据解码。缩略图已存在时（唯一标识符由内容哈希得到，
+    相同内容的图片已处理过）直接复用已有文件，不再解码和缩放
+
+    Args:
+        image: PIL Image对象
+        unique_id: 唯一标识符
+        width: 原图宽度
+        height: 原图高度
+        file_ext: 原图扩展名（带点号），原图不超过预览尺寸时直接作为预览图
+        original_url: 原图所在目录的URL前缀
+        previews_dir: 预览图目录路径
+        previews_url: 预览图URL前缀
+        thumbnails_dir: 缩略图目录路径
+        thumbnails_url: 缩略图URL前缀
+        thumbnail_format: 缩略图编码格式，JPEG或WEBP
+        source: 原始图片字节或文件路径
+
+    Returns:
+        包含preview_url和thumbnail_url的字典
+    """
+    # 预览图和缩略图都先写入临时文件再原子替换，缩略图最后替换，存在即说明两者都已完整生成
+    thumbnail_ext, save_options = _THUMBNAIL_SAVE_OPTIONS[thumbnail_format]
+    thumbnail_filename = f"{unique_id}_thumbnail{thumbnail_ext}"
+    if os.path.exists(f"{thumbnails_dir}/{thumbnail_filename}"):
+        if width > PREVIEW_MAX_SIZE or height > PREVIEW_MAX_SIZE:
+            preview_url = f"{previews_url}/{unique_id}_preview.webp"
+        else:
+            preview_url = f"{original_url}/{unique_id}{file_ext}"
+        return {"preview_url": preview_url, "thumbnail_url": f"{thumbnails_url}/{thumbnail_filename}"}
+
+    if pyvips is not None and source is not None:
+        try:
+            return _generate_derivatives_vips(
+                source, unique_id, width, height, file_ext,
+                original_url=original_url,
+                previews_dir=previews_dir,
+                previews_url=previews_url,
+                thumbnails_dir=thumbnails_dir,
+                thumbnails_url=thumbnails_url,
+                thumbnail_format=thumbnail_format,
+            )
+        except pyvips.Error:
+            # libvips编译时未包含对应格式的解码器（如HEIC需要libheif）时回退到Pillow
+            logger.warning("libvips无法处理图片%s，使用Pillow生成缩略图和预览图", unique_id, exc_info=True)
+
+    if source is not None:
+        image, _ = _open_image(source, (image.format or "").lower() or None)
+
+    result = {}
+    
+    # 首先处理EXIF旋转信息，确保图片方向正确
+    # 随后统一转换为RGB，预览图和缩略图的缩放与编码都只处理3通道数据
+    image = _to_rgb(ImageOps.exif_transpose(image))
+    
+    # 生成预览图 (最大边1500px，保持横竖比例)
+    # 先生成预览图，缩略图再从预览图缩小，避免对原图做第二次全分辨率缩放
+    if width > PREVIEW_MAX_SIZE or height > PREVIEW_MAX_SIZE:
+        preview = image.resize(_fit_size(image.size, PREVIEW_MAX_SIZE), _RESAMPLE, reducing_gap=_REDUCING_GAP)
+        
+        # 缩略图的缩放和编码与预览图的编码互不依赖，提交到线程池与预览图同时进行
+        thumbnail_future = _IMAGE_EXECUTOR.submit(_encode_thumbnail, preview, thumbnail_format, save_options)
+        
+        # 保存预览图
+        preview_filename = f"{unique_id}_preview.webp"
+        with _atomic_write(f"{previews_dir}/{preview_filename}") as (fd, _), os.fdopen(fd, "wb", closefd=False) as f:
+            preview.save(f, "WEBP", quality=90)
+        result["preview_url"] = f"{previews_url}/{preview_filename}"
+        
+        # 线程池已满、缩略图任务还没开始时取消并在当前线程执行，避免所有线程互相等待
+        if thumbnail_future.cancel():
+            thumbnail_data = _encode_thumbnail(preview, thumbnail_format, save_options)
+        else:
+            thumbnail_data = thumbnail_future.result()
+    else:
+        # 如果原图小于预览图尺寸，则使用原图作为预览图
+        result["preview_url"] = f"{original_url}/{unique_id}{file_ext}"
+        thumbnail_data = _encode_thumbnail(image, thumbnail_format, save_options)
+    
+    # 保存缩略图，在预览图之后替换到位
+    with _atomic_write(f"{thumbnails_dir}/{thumbnail_filename}") as (fd, _):
+        _write_all(fd, thumbnail_data)
+    result["thumbnail_url"] = f"{thumbnails_url}/{thumbnail_filename}"
+    
+    return result
+
+
+def _encode_thumbnail(image: Image.Image, thumbnail_format: str, save_options: Dict[str, Any]) -> bytes:
+    """生成缩略图 (最大边200px，保持横竖比例) 并编码到内存
+
+    resize直接返回新图片，无需先copy整张原图；本身不超过缩略图尺寸的小图直接编码，不再缩放复制
+
+    Args:
+        image: 已转换为RGB的预览图或原图
+        thumbnail_format: 缩略图编码格式，JPEG或WEBP
+        save_options: 编码参数
+
+    Returns:
+        编码后的缩略图数据
+    """
+    thumbnail_size = _fit_size(image.size, THUMBNAIL_MAX_SIZE)
+    if thumbnail_size != image.size:
+        image = image.resize(thumbnail_size, _RESAMPLE, reducing_gap=_REDUCING_GAP)
+    buffer = io.BytesIO()
+    image.save(buffer, thumbnail_format, **save_options)
+    return buffer.getvalue()
+
+
+def _vips_to_srgb(image: "pyvips.Image") -> "pyvips.Image":
+    """转换为sRGB并把透明通道合成到白色背景上，与Pillow路径的_to_rgb一致"""
+    image = image.colourspace("srgb")
+    if image.hasalpha():
+        image = image.flatten(background=[255, 255, 255])
+    return image
+
+
+def _generate_derivatives_vips(
+    source: Union[bytes, str],
+    unique_id: str,
+    width: int,
+    height: int,
+    file_ext: str,
+    *,
+    original_url: str,
+    previews_dir: str,
+    previews_url: str,
+    thumbnails_dir: str,
+    thumbnails_url: str,
+    thumbnail_format: str,
+) -> Dict[str, Any]:
+    """使用pyvips生成预览图和缩略图，参数和返回值与generate_derivatives相同
+
+    thumbnail/thumbnail_buffer在解码时按目标尺寸缩小并按EXIF方向自动旋转
+    """
+    if isinstance(source, bytes):
+        def load_thumbnail(size: int) -> "pyvips.Image":
+            return pyvips.Image.thumbnail_buffer(source, size, height=size, size="down")
+    else:
+        def load_thumbnail(size: int) -> "pyvips.Image":
+            return pyvips.Image.thumbnail(source, size, height=size, size="down")
+
+    result = {}
+    if width > PREVIEW_MAX_SIZE or height > PREVIEW_MAX_SIZE:
+        # 预览图物化到内存，缩略图再从预览图缩小，避免再次解码原图
+        preview = _vips_to_srgb(load_thumbnail(PREVIEW_MAX_SIZE)).copy_memory()
+        preview_filename = f"{unique_id}_preview.webp"
+        with _atomic_write(f"{previews_dir}/{preview_filename}") as (_, temp_path):
+            preview.webpsave(temp_path, Q=90, strip=True)
+        result["preview_url"] = f"{previews_url}/{preview_filename}"
+        thumbnail = preview.thumbnail_image(THUMBNAIL_MAX_SIZE, height=THUMBNAIL_MAX_SIZE, size="down")
+    else:
+        # 如果原图小于预览图尺寸，则使用原图作为预览图
+        result["preview_url"] = f"{original_url}/{unique_id}{file_ext}"
+        thumbnail = _vips_to_srgb(load_thumbnail(THUMBNAIL_MAX_SIZE))
+
+    thumbnail_ext = _THUMBNAIL_SAVE_OPTIONS[thumbnail_format][0]
+    thumbnail_filename = f"{unique_id}_thumbnail{thumbnail_ext}"
+    # 临时文件保留了扩展名，write_to_file据此选择编码格式
+    with _atomic_write(f"{thumbnails_dir}/{thumbnail_filename}") as (_, temp_path):
+        thumbnail.write_to_file(temp_path, **_VIPS_THUMBNAIL_SAVE_OPTIONS[thumbnail_format])
+    result["thumbnail_url"] = f"{thumbnails_url}/{thumbnail_filename}"
+    return result
+
+
+@contextmanager
+def _atomic_write(file_path: str) -> Iterator[Tuple[int, str]]:
+    """在目标目录中创建临时文件，写入完成后用os.replace原子地替换到目标路径
+
+    文件以内容哈希命名，目标路径存在即视为已完整生成：同一图片并发上传时各自写入自己的临时文件，
+    其他请求只会看到不存在或完整的文件，不会读到写了一半的文件；写入出错时删除临时文件，不留下残缺文件
+
+    Args:
+        file_path: 文件保存路径
+
+    Yields:
+        (临时文件的文件描述符, 临时文件路径) 元组，文件描述符由本函数关闭
+    """
+    directory, filename = os.path.split(file_path)
+    # 保留扩展名，libvips按扩展名选择编码格式；以点号开头，不会与内容哈希命名的文件混淆
+    fd, temp_path = tempfile.mkstemp(prefix=f".{filename}.", suffix=get_file_ext(filename), dir=directory or None)
+    try:
+        try:
+            yield fd, temp_path
+        finally:
+            os.close(fd)
+        # mkstemp创建的文件只有属主可读，改为与普通上传文件一致的权限，便于nginx直接读取静态文件
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+def _write_all(fd: int, content: bytes) -> None:
+    """直接用文件描述符写入完整的字节数据，不经过BufferedWriter缓冲层"""
+    view = memoryview(content)
+    while view:
+        # os.write可能只写入部分数据，循环写完剩余部分
+        view = view[os.write(fd, view):]
+
+
+def save_image_file(file_path: str, content: bytes) -> None:
+    """保存图片文件到指定路径，先写入临时文件再原子替换
+
+    默认不调用fsync强制落盘：上传的图片可以重新上传，以数据库记录为准，无需为每个文件等待磁盘同步；
+    开启UPLOAD_FSYNC后只对原图落盘，缩略图和预览图可以重新生成
+    
+    Args:
+        file_path: 文件保存路径
+        content: 文件内容
+    """
+    with _atomic_write(file_path) as (fd, _):
+        _write_all(fd, content)
+        if settings.UPLOAD_FSYNC:
+            _sync_file(fd)
+
+
+def _copy_upload(source: BinaryIO, directory: Optional[str], file_ext: str) -> Tuple[str, str, int]:
+    """将上传文件按块复制到临时文件，复制的同时计算内容标识符，与content_id结果一致
+
+    UploadFile底层是SpooledTemporaryFile，按块复制无需把整个文件读入内存，上传文件只读取一次
+
+    Args:
+        source: 上传文件的文件对象，需已定位到开头
+        directory: 临时文件所在目录，为None时使用系统临时目录
+        file_ext: 文件扩展名（带点号）
+
+    Returns:
+        (内容标识符, 临时文件路径, 写入的字节数) 元组
+
+    Raises:
+        ValueError: 文件过大时，不会留下写了一半的临时文件
+    """
+    # 以点号开头，不会与内容哈希命名的文件混淆
+    fd, temp_path = tempfile.mkstemp(prefix=".upload-", suffix=file_ext, dir=directory)
+    try:
+        digest = hashlib.blake2b(digest_size=16)
+        with os.fdopen(fd, "wb") as f:
+            for chunk in _read_upload_chunks(source):
+                digest.update(chunk)
+                f.write(chunk)
+            if settings.UPLOAD_FSYNC:
+                f.flush()
+                _sync_file(f.fileno())
+            return digest.hexdigest(), temp_path, f.tell()
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+def save_upload_file(directory: str, source: BinaryIO, file_ext: str) -> Tuple[str, str, int]:
+    """将上传文件保存为<内容标识符><扩展名>，先写入临时文件再原子替换
+
+    内容标识符在写盘时计算，写完后才知道文件名；与save_image_file一样只在开启UPLOAD_FSYNC时落盘。
+    相同内容的原图已存在时替换为内容相同的新文件，其他请求读到的始终是完整的文件
+
+    Args:
+        directory: 原图保存目录
+        source: 上传文件的文件对象，需已定位到开头
+        file_ext: 文件扩展名（带点号）
+
+    Returns:
+        (内容标识符, 原图路径, 写入的字节数) 元组
+
+    Raises:
+        ValueError: 文件过大时，不会留下写了一半的文件
+    """
+    unique_id, temp_path, file_size = _copy_upload(source, directory, file_ext)
+    file_path = f"{directory}/{unique_id}{file_ext}"
+    try:
+        # mkstemp创建的文件只有属主可读，改为与普通上传文件一致的权限，便于nginx直接读取静态文件
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+    return unique_id, file_path, file_size
+
+
+async def run_in_image_executor(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """在图片处理线程池中执行同步函数，避免阻塞事件循环
+
+    Args:
+        func: 同步函数
+        *args: 位置参数
+        **kwargs: 关键字参数
+
+    Returns:
+        函数的返回值
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_IMAGE_EXECUTOR, partial(func, *args, **kwargs))
+
+
+async def run_render(render: Callable[[Union[bytes, str]], Dict[str, Any]], source: Union[bytes, str]) -> Dict[str, Any]:
+    """生成缩略图和预览图，配置了图片处理进程池时在子进程中执行，否则在线程池中执行
+
+    Args:
+        render: 可被pickle的同步处理函数（模块级函数或其partial）
+        source: 图片文件内容或原图路径
+
+    Returns:
+        render的返回值
+    """
+    if _IMAGE_PROCESS_POOL is None:
+        return await run_in_image_executor(render, source)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_IMAGE_PROCESS_POOL, render, source)
+
+
+async def delete_files(paths: Collection[str]) -> None:
+    """在线程池中并发删除文件，不存在的文件直接跳过
+
+    unlink(missing_ok=True)只需一次系统调用，无需先exists再remove；单个文件删除失败只记录日志
+
+    Args:
+        paths: 待删除的文件路径
+    """
+    results = await asyncio.gather(
+        *(run_in_image_executor(Path(path).unlink, missing_ok=True) for path in paths),
+        return_exceptions=True,
+    )
+    for path, result in zip(paths, results):
+        if isinstance(result, Exception):
+            logger.error("删除文件失败: %s: %s", path, result)
+
+
+async def persist_upload(
+    source: BinaryIO,
+    directory: Optional[str],
+    file_ext: str,
+    render: Callable[..., Dict[str, Any]],
+) -> Tuple[str, Dict[str, Any], int]:
+    """按块保存上传文件并生成缩略图和预览图，封面和照片的文件上传流程共用
+
+    写盘的同时计算内容标识符，再直接从文件解码，上传文件只读取一次，不在内存中保留整个文件内容；
+    不保存原图时写入系统临时目录，处理完成后删除
+
+    Args:
+        source: 已定位到开头的上传文件对象
+        directory: 原图保存目录，为None时不保存原图
+        file_ext: 文件扩展名（带点号）
+        render: 在线程池（或进程池）中执行的同步处理函数，接收原图路径和unique_id关键字参数
+
+    Returns:
+        (内容标识符, 处理结果字典, 原图字节数) 元组
+    """
+    if directory is None:
+        unique_id, file_path, file_size = await run_in_image_executor(_copy_upload, source, None, file_ext)
+        try:
+            return unique_id, await run_render(partial(render, unique_id=unique_id), file_path), file_size
+        finally:
+            await run_in_image_executor(os.unlink, file_path)
+
+    unique_id, file_path, file_size = await run_in_image_executor(save_upload_file, directory, source, file_ext)
+    return unique_id, await run_render(partial(render, unique_id=unique_id), file_path), file_size
+
+
+async def persist_image(
+    source: bytes,
+    file_path: Optional[str],
+    render: Callable[[Union[bytes, str]], Dict[str, Any]],
+) -> Dict[str, Any]:
+    """保存原图并在线程池中生成缩略图和预览图，封面和照片的base64上传流程共用
+
+    原图写盘与图片处理在不同线程中同时进行
+
+    Args:
+        source: 图片文件内容
+        file_path: 原图保存路径，为None时不保存原图
+        render: 在线程池（或进程池）中执行的同步处理函数，接收图片内容
+
+    Returns:
+        处理结果字典
+    """
+    # 以内容哈希命名的原图已存在时无需重复写入
+    if file_path is None or os.path.exists(file_path):
+        return await run_render(render, source)
+
+    result, _ = await asyncio.gather(
+        run_render(render, source),
+        run_in_image_executor(save_image_file, file_path, source),
+    )
+    return result
+
+
+def get_file_ext(filename: Optional[str]) -> str:
+    """获取小写的文件扩展名（包含点号），没有扩展名时返回空字符串
+    
+    Args:
+        filename: 原始文件名
+        
+    Returns:
+        文件扩展名，如 ".jpg"
+    """
+    if not filename:
+        return ""
+    name, dot, ext = filename.rpartition(".")
+    # 没有点号或仅以点号开头的隐藏文件视为无扩展名，与os.path.splitext一致
+    if not dot or not name.strip("."):
+        return ""
+    return f".{ext.lower()}"
+
+
+def _rational_to_float(value: Any) -> float:
+    """将EXIF有理数转换为浮点数，兼容piexif的(分子, 分母)元组和Pillow的IFDRational"""
+    if isinstance(value, tuple):
+        numerator, denominator = value
+        return numerator / denominator if denominator else 0.0
+    return float(value)
+
+
+def _gps_to_degrees(value: Any, ref: Any, negative_ref: str) -> Optional[float]:
+    """将EXIF中的度分秒GPS坐标转换为十进制度数
+
+    Args:
+        value: 度、分、秒三元组
+        ref: 方向参考（N/S/E/W）
+        negative_ref: 表示负方向的参考值（S或W）
+
+    Returns:
+        十进制度数，格式不正确时返回None
+    """
+    if not isinstance(value, (list, tuple)) or len(value) < 3:
+        return None
+    degrees = _rational_to_float(value[0]) + _rational_to_float(value[1]) / 60 + _rational_to_float(value[2]) / 3600
+    if isinstance(ref, bytes):
+        ref = ref.decode("ascii", "ignore")
+    return -degrees if ref == negative_ref else degrees
+
+
+def _read_exif_tags(raw: Optional[bytes]) -> Tuple[Optional[str], Dict[int, Any]]:
+    """读取拍摄时间和GPS信息两个EXIF字段
+
+    安装了piexif时直接解析原始EXIF字节，只取需要的字段；否则回退到Pillow的Exif解析，
+    只读取Exif和GPS两个子IFD，不像_getexif那样把全部标签展开成字典。
+    两种方式都只解析原始EXIF字节，不会触发像素解码
+
+    Args:
+        raw: 原始EXIF字节
+
+    Returns:
+        (DateTimeOriginal字符串, GPSInfo字典) 元组
+    """
+    if not raw:
+        return None, {}
+    if piexif is not None:
+        exif = piexif.load(raw)
+        date_taken = exif["Exif"].get(piexif.ExifIFD.DateTimeOriginal)
+        if isinstance(date_taken, bytes):
+            date_taken = date_taken.decode("ascii", "ignore")
+        return date_taken, exif.get("GPS") or {}
+
+    exif = Image.Exif()
+    exif.load(raw)
+    # 0x8769为Exif子IFD（DateTimeOriginal所在），0x8825为GPS子IFD
+    return exif.get_ifd(0x8769).get(36867), exif.get_ifd(0x8825)
+
+
+def _parse_exif_datetime(value: str) -> Optional[datetime]:
+    """解析EXIF中固定为"YYYY:MM:DD HH:MM:SS"格式的时间
+
+    直接按位置切片，比strptime快一个数量级
+
+    Args:
+        value: EXIF时间字符串
+
+    Returns:
+        不带时区的datetime，格式不正确时返回None
+    """
+    try:
+        return datetime(
+            int(value[0:4]), int(value[5:7]), int(value[8:10]),
+            int(value[11:13]), int(value[14:16]), int(value[17:19]),
+        )
+    except (ValueError, TypeError):
+        return None
+
+
+def extract_exif_data(image: Image.Image) -> Dict[str, Any]:
+    """从图片中提取EXIF数据
+    
+    Args:
+        image: PIL Image对象，只解析了文件头即可
+        
+    Returns:
+        包含提取的数据字典（taken_at, latitude, longitude等）
+    """
+    result = {}
+    try:
+        date_taken, gps_info = _read_exif_tags(image.info.get("exif"))
+        
+        # 提取拍摄时间，解析EXIF中的时间（通常是本地时间）
+        taken_at = _parse_exif_datetime(date_taken) if date_taken else None  # DateTimeOriginal
+        if taken_at:
+            import pytz
+            # 将时间设置为上海时区
+            shanghai_tz = pytz.timezone('Asia/Shanghai')
+            taken_at_shanghai = shanghai_tz.localize(taken_at)
+            result["taken_at"] = taken_at_shanghai.isoformat()
+        
+        # 提取GPS信息
+        # 提取纬度
+        if 2 in gps_info and 1 in gps_info:  # GPSLatitude and GPSLatitudeRef
+            latitude = _gps_to_degrees(gps_info[2], gps_info[1], "S")
+            if latitude is not None:
+                result["latitude"] = latitude
+        
+        # 提取经度
+        if 4 in gps_info and 3 in gps_info:  # GPSLongitude and GPSLongitudeRef
+            longitude = _gps_to_degrees(gps_info[4], gps_info[3], "W")
+            if longitude is not None:
+                result["longitude"] = longitude
+                            
+    except Exception:
+        logger.exception("提取EXIF数据时出错")
+    
+    return result
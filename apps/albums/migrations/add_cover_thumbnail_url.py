@@ -0,0 +1,42 @@
+from tortoise import Tortoise
+import asyncio
+from pathlib import Path
+import sys
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.append(str(project_root))
+
+from core.settings import settings
+from apps.albums.models import Album
+
+
+async def add_album_cover_thumbnail_url():
+    """为已有的相册表添加cover_thumbnail_url字段
+    
+    generate_schemas(safe=True)不会给已存在的表添加字段，升级前创建的数据库需要运行一次本脚本。
+    已有相册的该字段为空，封面缩略图URL按封面URL推导
+    """
+    
+    # 初始化Tortoise ORM
+    await Tortoise.init(
+        db_url=settings.DATABASE_URL,
+        modules={"models": ["apps.albums.models"]}
+    )
+    
+    connection = Tortoise.get_connection("default")
+    table = Album._meta.db_table
+    try:
+        await connection.execute_query(f"SELECT cover_thumbnail_url FROM {table} LIMIT 1")
+        print("cover_thumbnail_url字段已存在，无需迁移")
+    except Exception:
+        await connection.execute_script(f"ALTER TABLE {table} ADD COLUMN cover_thumbnail_url VARCHAR(1024)")
+        print(f"已为{table}表添加cover_thumbnail_url字段")
+    
+    # 关闭数据库连接
+    await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    # 运行迁移脚本
+    asyncio.run(add_album_cover_thumbnail_url())
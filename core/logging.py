@@ -46,7 +46,8 @@ def setup_logging():
     # 配置日志输出
     logger.configure(
         handlers=[
-            {"sink": sys.stdout, "format": log_format, "level": log_level, "filter": debug_filter},
+            # enqueue=True 由后台线程写出日志，避免请求路径上阻塞stdout
+            {"sink": sys.stdout, "format": log_format, "level": log_level, "filter": debug_filter, "enqueue": True},
             {
                 "sink": str(logs_dir / "app.log"), 
                 "rotation": "100 MB",  # 减小轮转大小，避免大文件权限问题
@@ -64,7 +65,10 @@ def setup_logging():
     )
 
     # 拦截标准库的日志
-    logging.basicConfig(handlers=[InterceptHandler()], level=0, force=True)
+    # 标准库日志级别与LOG_LEVEL一致，低于该级别的记录（如上传流程中逐张照片的DEBUG日志）
+    # 在logger.debug调用处就被丢弃，不再格式化消息并转发给loguru；TRACE等loguru专有级别仍全部转发
+    std_level = logging.getLevelName(log_level.upper())
+    logging.basicConfig(handlers=[InterceptHandler()], level=std_level if isinstance(std_level, int) else 0, force=True)
 
     # 设置第三方库的日志级别
     for _log in ['uvicorn', 'uvicorn.error', 'fastapi']:
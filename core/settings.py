@@ -104,7 +104,16 @@ class Settings(BaseSettings):
     CONVERTERS_HANDLE_MAX_EXCEL_SIZE: int = 5 * 1024 * 1024  # 5MB
     
     # 图片处理配置
+    MAX_IMAGE_UPLOAD_SIZE: int = 50 * 1024 * 1024  # 相册图片的最大上传大小（50MB），超过时不解码直接拒绝
+    MAX_IMAGE_PIXELS: int = 100_000_000  # 相册图片的最大像素数（1亿），只解析文件头即可拒绝解压炸弹
     SAVE_ORIGINAL_PHOTOS: bool = False  # 是否保存原始图片文件，默认不保存
+    UPLOAD_FSYNC: bool = False  # 保存原始图片后是否fsync强制落盘，默认关闭
+    IMAGE_RESAMPLING: str = "bicubic"  # 生成预览图和缩略图的缩放滤镜：nearest/box/bilinear/hamming/bicubic/lanczos
+    THUMBNAIL_JPEG_QUALITY: int = 85  # JPEG缩略图的编码质量
+    THUMBNAIL_JPEG_OPTIMIZE: bool = True  # JPEG缩略图是否计算最优Huffman表，文件更小，小图上几乎不增加耗时
+    THUMBNAIL_JPEG_PROGRESSIVE: bool = False  # JPEG缩略图是否使用渐进式编码，200px的小图渐进式反而更大，默认关闭
+    COVER_THUMBNAIL_FORMAT: str = "WEBP"  # 新上传的相册封面缩略图的编码格式：WEBP/JPEG，已有的封面缩略图保持原格式
+    IMAGE_PROCESS_WORKERS: int = 0  # 大于0时在该数量的子进程中生成缩略图和预览图，默认0只使用线程池
     
     # 文件访问保护配置
     PROTECTED_FILE_ENABLE: bool = True  # 是否启用文件访问保护功能
@@ -14,6 +14,9 @@ NGINX_SBIN_DIR="${NGINX_DIR}/sbin"
 #nginx的conf目录
 NGINX_CONF_FILE_PATH="${NGINX_DIR}/conf/conf.d/http/fastdog.conf"
 
+# 是否使用Pillow-SIMD替换Pillow（AVX2加速缩略图/预览图的LANCZOS缩放，需要服务器CPU支持AVX2）
+USE_PILLOW_SIMD=false
+
 
 # 检查是否使用supervisor
 USE_SUPERVISOR=true
@@ -61,6 +64,14 @@ uv sync 2>&1 | tee -a ${LOG_FILE}
 source ${VENV_DIR}/bin/activate
 log "Python虚拟环境已激活..."
 
+# Pillow-SIMD与Pillow接口一致，替换后相册图片处理代码无需修改
+# 源码编译前需安装libjpeg-turbo的开发包（如libjpeg-turbo8-dev），否则JPEG编解码没有SIMD加速
+if [ "$USE_PILLOW_SIMD" = true ]; then
+    log "使用Pillow-SIMD替换Pillow..."
+    uv pip uninstall pillow 2>&1 | tee -a ${LOG_FILE}
+    CC="cc -mavx2" uv pip install --no-binary pillow-simd pillow-simd 2>&1 | tee -a ${LOG_FILE}
+fi
+
 # 配置环境变量
 log "配置环境变量..."
 if [ ! -f "${APP_DIR}/.env" ]; then
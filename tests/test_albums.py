@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相册管理的单元测试：封面URL推导、原图URL标准化、批量保存回滚和共用文件的删除
+"""
+
+import asyncio
+import base64
+import io
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from PIL import Image
+from tortoise import Tortoise
+
+from core.settings import settings
+from apps.albums import admin
+from apps.albums.admin import DEFAULT_PHOTO_URL, PhotoModelAdmin, _normalize_original_url
+from apps.albums.crud import cover_thumbnail_url
+from apps.albums.models import Album, Photo
+
+
+def _data_uri(color, size=(2000, 1000)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG")
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+@pytest.fixture
+def run_with_db(tmp_path, monkeypatch):
+    """把上传目录指向临时目录，在内存SQLite数据库中执行异步测试"""
+    monkeypatch.setattr(settings, "STATIC_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "SAVE_ORIGINAL_PHOTOS", True)
+    photos_dir = tmp_path / "uploads" / "photos"
+    for name, path in (("PHOTOS_DIR", photos_dir), ("THUMBNAILS_DIR", photos_dir / "thumbnails"), ("PREVIEWS_DIR", photos_dir / "previews")):
+        path.mkdir(parents=True, exist_ok=True)
+        monkeypatch.setattr(admin, name, str(path))
+
+    def run(test):
+        async def main():
+            await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["apps.albums.models"]})
+            await Tortoise.generate_schemas()
+            try:
+                return await test(PhotoModelAdmin(Photo), await Album.create(name="album"))
+            finally:
+                await Tortoise.close_connections()
+        return asyncio.run(main())
+
+    return run
+
+
+def _files(root):
+    return sorted(path.name for path in root.rglob("*") if path.is_file())
+
+
+def test_cover_thumbnail_url():
+    """测试封面缩略图URL优先使用保存的URL，旧相册按封面URL推导JPEG缩略图，不检查文件"""
+    album = Album(cover_image="/static/uploads/albums/abc_preview.webp", cover_thumbnail_url="/static/uploads/albums/abc_thumbnail.webp")
+    assert cover_thumbnail_url(album) == "/static/uploads/albums/abc_thumbnail.webp"
+
+    album.cover_thumbnail_url = None
+    assert cover_thumbnail_url(album) == "/static/uploads/albums/abc_thumbnail.jpg"
+    # 小图的封面URL是原图URL
+    album.cover_image = "/static/uploads/albums/abc.png"
+    assert cover_thumbnail_url(album) == "/static/uploads/albums/abc_thumbnail.jpg"
+
+
+def test_save_cover_stores_thumbnail_url(tmp_path, monkeypatch, run_with_db):
+    """测试保存相册封面时记录实际生成的缩略图URL"""
+    albums_dir = tmp_path / "uploads" / "albums"
+    albums_dir.mkdir(parents=True)
+    monkeypatch.setattr(admin, "ALBUMS_DIR", str(albums_dir))
+    monkeypatch.setattr(settings, "COVER_THUMBNAIL_FORMAT", "WEBP")
+
+    async def test(photo_admin, album):
+        album_admin = admin.AlbumModelAdmin(Album)
+        await album_admin.save_model(album.id, {"cover_image": _data_uri((255, 255, 0))})
+        album = await Album.get(id=album.id)
+        assert album.cover_thumbnail_url.endswith("_thumbnail.webp")
+        assert (albums_dir / os.path.basename(album.cover_thumbnail_url)).is_file()
+
+    run_with_db(test)
+
+
+def test_normalize_original_url():
+    """测试original_url统一为非空列表，没有上传图片时回退到预览图或默认图片"""
+    payload = {"original_url": "/a.jpg"}
+    _normalize_original_url(payload)
+    assert payload["original_url"] == ["/a.jpg"]
+
+    payload = {"original_url": None}
+    _normalize_original_url(payload)
+    assert payload["original_url"] == [DEFAULT_PHOTO_URL]
+
+    payload = {"original_url": [DEFAULT_PHOTO_URL], "preview_url": "/p.webp"}
+    _normalize_original_url(payload)
+    assert payload["original_url"] == ["/p.webp"]
+
+    # 已有原图时只有保存前（prefer_preview）才替换为预览图
+    payload = {"original_url": ["/a.jpg"], "preview_url": "/p.webp"}
+    _normalize_original_url(payload)
+    assert payload["original_url"] == ["/a.jpg"]
+    _normalize_original_url(payload, prefer_preview=True)
+    assert payload["original_url"] == ["/p.webp"]
+
+
+def test_failed_bulk_save_removes_only_unshared_files(tmp_path, monkeypatch, run_with_db):
+    """测试批量保存失败时整体回滚，只删除本批次新生成的文件，与已有照片共用的文件保留"""
+    async def test(photo_admin, album):
+        await photo_admin.save_model(None, {"album": album.id, "original_url": [_data_uri((255, 0, 0))]})
+        existing_files = _files(tmp_path)
+
+        payloads = [
+            await photo_admin.process_file(_data_uri(color), {"album": album.id})
+            for color in ((255, 0, 0), (0, 0, 255))
+        ]
+        assert len(_files(tmp_path)) > len(existing_files)
+
+        async def broken_bulk_create(*args, **kwargs):
+            raise RuntimeError("database unavailable")
+
+        monkeypatch.setattr(Photo, "bulk_create", broken_bulk_create)
+        with pytest.raises(RuntimeError):
+            await photo_admin.bulk_save_photos(payloads)
+
+        # 第一条记录随事务回滚，红色图片的文件仍被已有照片引用
+        assert await Photo.all().count() == 1
+        assert _files(tmp_path) == existing_files
+
+    run_with_db(test)
+
+
+def test_delete_keeps_files_shared_by_identical_photos(tmp_path, run_with_db):
+    """测试删除内容相同的两张照片之一时保留共用文件，两张都删除后文件才删除"""
+    async def test(photo_admin, album):
+        first = await photo_admin.save_model(None, {"album": album.id, "original_url": [_data_uri((0, 255, 0))]})
+        second = await photo_admin.save_model(None, {"album": album.id, "original_url": [_data_uri((0, 255, 0))]})
+        assert first["thumbnail_url"] == second["thumbnail_url"]
+        shared_files = _files(tmp_path)
+        assert len(shared_files) == 3
+
+        await photo_admin.delete_model(first["id"])
+        assert _files(tmp_path) == shared_files
+
+        await photo_admin.delete_model(second["id"])
+        assert _files(tmp_path) == []
+
+    run_with_db(test)
+
+
+def test_failed_upload_removes_files_of_processed_images(tmp_path, run_with_db):
+    """测试多图上传中有图片处理失败时删除其余图片已生成的文件，修改照片时保留旧文件"""
+    async def test(photo_admin, album):
+        photo = await photo_admin.save_model(None, {"album": album.id, "original_url": [_data_uri((255, 0, 0))]})
+        existing_files = _files(tmp_path)
+
+        invalid = "data:image/jpeg;base64," + base64.b64encode(b"not an image").decode()
+        with pytest.raises(ValueError):
+            await photo_admin.save_model(None, {"album": album.id, "original_url": [_data_uri((0, 0, 255)), invalid]})
+        assert _files(tmp_path) == existing_files
+
+        # 修改照片时新图片处理失败，当前照片的旧文件保留
+        with pytest.raises(ValueError):
+            await photo_admin.save_model(photo["id"], {"album": album.id, "original_url": [_data_uri((0, 0, 255)), invalid]})
+        assert _files(tmp_path) == existing_files
+        assert await Photo.all().count() == 1
+
+    run_with_db(test)
+
+
+def test_edit_with_multiple_images_replaces_old_files(tmp_path, run_with_db):
+    """测试修改照片并上传多张图片时，保存成功后才删除旧文件"""
+    async def test(photo_admin, album):
+        photo = await photo_admin.save_model(None, {"album": album.id, "original_url": [_data_uri((255, 0, 0))]})
+        old_files = set(_files(tmp_path))
+
+        result = await photo_admin.save_model(photo["id"], {"album": album.id, "original_url": [_data_uri((0, 0, 255)), _data_uri((0, 255, 0))]})
+        assert await Photo.all().count() == 2
+        files = set(_files(tmp_path))
+        assert not files & old_files
+        assert os.path.basename(result["thumbnail_url"]) in files
+
+        # 新图片与旧图片内容相同时，当前照片仍引用这些文件
+        result = await photo_admin.save_model(photo["id"], {"album": album.id, "original_url": [_data_uri((0, 0, 255)), _data_uri((255, 255, 0))]})
+        assert os.path.basename(result["thumbnail_url"]) in _files(tmp_path)
+
+    run_with_db(test)
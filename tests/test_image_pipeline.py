@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相册图片处理流程的单元测试
+"""
+
+import base64
+import io
+from datetime import datetime
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from PIL import Image
+
+from core.settings import settings
+
+from apps.albums import image_pipeline
+from apps.albums.image_pipeline import (
+    _fit_size,
+    _parse_exif_datetime,
+    _to_rgb,
+    extract_exif_data,
+    check_upload_size,
+    decode_base64_image,
+    generate_derivatives,
+    get_file_ext,
+    open_image,
+    parse_data_uri,
+    save_upload_file,
+    sniff_base64_image_format,
+    sniff_image_format,
+)
+
+
+def _encode(size, image_format):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (10, 200, 30)).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def test_sniff_image_format():
+    """测试根据文件头识别图片格式"""
+    assert sniff_image_format(_encode((8, 8), "JPEG")) == "jpeg"
+    assert sniff_image_format(_encode((8, 8), "PNG")) == "png"
+    assert sniff_image_format(_encode((8, 8), "GIF")) == "gif"
+    assert sniff_image_format(_encode((8, 8), "WEBP")) == "webp"
+    assert sniff_image_format(b"\x00\x00\x00\x18ftypheic") == "heic"
+    assert sniff_image_format(b"not an image") is None
+
+
+def test_parse_data_uri():
+    """测试拆分base64图片data URI"""
+    content = _encode((8, 8), "PNG")
+    file_type, data = parse_data_uri("data:image/png;base64," + base64.b64encode(content).decode())
+    assert file_type == "png"
+    assert base64.b64decode(data) == content
+    assert sniff_base64_image_format(data) == "png"
+
+    assert parse_data_uri("data:text/plain;base64,aGVsbG8=") is None
+    assert parse_data_uri("data:image/png,raw") is None
+    assert parse_data_uri("data:image/png;base64") is None
+
+
+def test_sniff_base64_image_format_rejects_non_images():
+    """测试只解码base64开头即可拒绝非图片数据"""
+    assert sniff_base64_image_format(memoryview(base64.b64encode(b"hello world, not an image"))) is None
+    assert sniff_base64_image_format(memoryview(b"!!!!invalid!!!!!")) is None
+
+
+def test_get_file_ext():
+    """测试获取小写的文件扩展名"""
+    assert get_file_ext("photo.JPG") == ".jpg"
+    assert get_file_ext("archive.tar.png") == ".png"
+    assert get_file_ext("noext") == ""
+    assert get_file_ext(".hidden") == ""
+    assert get_file_ext(None) == ""
+
+
+def test_fit_size():
+    """测试等比缩放尺寸计算"""
+    assert _fit_size((4000, 3000), 1500) == (1500, 1125)
+    assert _fit_size((3000, 4000), 200) == (150, 200)
+    assert _fit_size((100, 50), 200) == (100, 50)
+
+
+def test_to_rgb_composites_alpha_over_white():
+    """测试透明像素合成到白色背景，RGB图片直接返回原对象"""
+    image = Image.new("RGB", (4, 4), (10, 20, 30))
+    assert _to_rgb(image) is image
+
+    transparent = Image.new("RGBA", (4, 4), (0, 0, 0, 0))
+    transparent.putpixel((0, 0), (10, 20, 30, 255))
+    rgb = _to_rgb(transparent)
+    assert rgb.mode == "RGB"
+    assert rgb.getpixel((0, 0)) == (10, 20, 30)
+    assert rgb.getpixel((1, 1)) == (255, 255, 255)
+    assert _to_rgb(Image.new("LA", (4, 4), (0, 0))).getpixel((0, 0)) == (255, 255, 255)
+
+
+def test_parse_exif_datetime():
+    """测试解析EXIF时间，格式不正确时返回None"""
+    assert _parse_exif_datetime("2023:05:06 07:08:09") == datetime(2023, 5, 6, 7, 8, 9)
+    assert _parse_exif_datetime("0000:00:00 00:00:00") is None
+    assert _parse_exif_datetime("2023:05:06") is None
+
+
+def test_rejects_oversized_images(tmp_path, monkeypatch):
+    """测试只解析文件头即可拒绝像素过多的图片，base64数据按编码长度拒绝过大的文件"""
+    monkeypatch.setattr(settings, "MAX_IMAGE_PIXELS", 100)
+    assert open_image(_encode((10, 10), "PNG"), decode=False)[1] == (10, 10)
+    with pytest.raises(ValueError):
+        open_image(_encode((20, 10), "PNG"), decode=False)
+
+    monkeypatch.setattr(settings, "MAX_IMAGE_UPLOAD_SIZE", 1024)
+    check_upload_size(None)
+    check_upload_size(1024)
+    with pytest.raises(ValueError):
+        check_upload_size(1025)
+    with pytest.raises(ValueError):
+        decode_base64_image(memoryview(b"A" * 2048))
+
+    # 没有Content-Length时以实际读取的字节数为准，超限的文件不会写盘
+    with pytest.raises(ValueError):
+        save_upload_file(str(tmp_path), io.BytesIO(b"x" * 1025), ".jpg")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_extract_exif_data_from_header():
+    """测试只解析文件头即可从JPEG和PNG中读取拍摄时间，没有EXIF时返回空字典"""
+    exif = Image.Exif()
+    exif[0x8769] = {36867: "2023:05:06 07:08:09"}
+    for image_format in ("JPEG", "PNG"):
+        buffer = io.BytesIO()
+        Image.new("RGB", (8, 8)).save(buffer, image_format, exif=exif.tobytes())
+        image, _ = open_image(buffer.getvalue(), decode=False)
+        assert extract_exif_data(image)["taken_at"] == "2023-05-06T07:08:09+08:00"
+
+    assert extract_exif_data(open_image(_encode((8, 8), "JPEG"), decode=False)[0]) == {}
+
+
+def test_generate_derivatives(tmp_path):
+    """测试生成预览图和缩略图，小图直接使用原图作为预览图"""
+    for size in ((2000, 1000), (120, 80)):
+        unique_id = f"img{size[0]}"
+        image, (width, height) = open_image(_encode(size, "JPEG"))
+        result = generate_derivatives(
+            image, unique_id, width, height, ".jpg",
+            original_url="/original",
+            previews_dir=str(tmp_path),
+            previews_url="/previews",
+            thumbnails_dir=str(tmp_path),
+            thumbnails_url="/thumbnails",
+            thumbnail_format="WEBP",
+        )
+        assert result["thumbnail_url"] == f"/thumbnails/{unique_id}_thumbnail.webp"
+        thumbnail = Image.open(tmp_path / f"{unique_id}_thumbnail.webp")
+        assert max(thumbnail.size) == min(200, max(size))
+
+        if max(size) > 1500:
+            assert result["preview_url"] == f"/previews/{unique_id}_preview.webp"
+            assert Image.open(tmp_path / f"{unique_id}_preview.webp").size == (1500, 750)
+        else:
+            assert result["preview_url"] == f"/original/{unique_id}.jpg"
+
+
+def test_content_id_reuses_derivatives(tmp_path):
+    """测试相同内容得到相同的标识符，缩略图已存在时直接复用而不重新生成"""
+    content = _encode((2000, 1000), "JPEG")
+    unique_id, decoded = decode_base64_image(memoryview(base64.b64encode(content)))
+    assert decoded == content
+    assert decode_base64_image(memoryview(base64.b64encode(content)))[0] == unique_id
+    assert decode_base64_image(memoryview(base64.b64encode(_encode((8, 8), "JPEG"))))[0] != unique_id
+    # 上传文件在写盘时计算的标识符与内容一致
+    assert save_upload_file(str(tmp_path), io.BytesIO(content), ".jpg")[0] == unique_id
+
+    options = dict(
+        original_url="/original",
+        previews_dir=str(tmp_path),
+        previews_url="/previews",
+        thumbnails_dir=str(tmp_path),
+        thumbnails_url="/thumbnails",
+        thumbnail_format="JPEG",
+        source=content,
+    )
+    image, (width, height) = open_image(content, decode=False)
+    first = generate_derivatives(image, unique_id, width, height, ".jpg", **options)
+    thumbnail_path = tmp_path / f"{unique_id}_thumbnail.jpg"
+    mtime = thumbnail_path.stat().st_mtime_ns
+    os.utime(thumbnail_path, ns=(mtime - 10**9, mtime - 10**9))
+
+    assert generate_derivatives(image, unique_id, width, height, ".jpg", **options) == first
+    assert thumbnail_path.stat().st_mtime_ns == mtime - 10**9
+
+
+def test_save_upload_file_is_atomic(tmp_path):
+    """测试原图写盘时按内容命名，先写入临时文件再替换，复制失败时不留下残缺的原图和临时文件"""
+    unique_id, file_path, file_size = save_upload_file(str(tmp_path), io.BytesIO(b"x" * 100), ".jpg")
+    assert file_path == f"{tmp_path}/{unique_id}.jpg"
+    assert file_size == 100
+    assert open(file_path, "rb").read() == b"x" * 100
+    assert [p.name for p in tmp_path.iterdir()] == [f"{unique_id}.jpg"]
+
+    class BrokenUpload(io.BytesIO):
+        def read(self, size=-1):
+            if self.tell():
+                raise OSError("connection reset")
+            return super().read(10)
+
+    with pytest.raises(OSError):
+        save_upload_file(str(tmp_path), BrokenUpload(b"y" * 100), ".jpg")
+    assert [p.name for p in tmp_path.iterdir()] == [f"{unique_id}.jpg"]
+
+
+def test_failed_render_leaves_no_thumbnail(tmp_path, monkeypatch):
+    """测试生成失败时不留下缩略图和临时文件，再次上传相同内容时重新生成而不是复用残缺文件"""
+    content = _encode((2000, 1000), "JPEG")
+    options = dict(
+        original_url="/original",
+        previews_dir=str(tmp_path),
+        previews_url="/previews",
+        thumbnails_dir=str(tmp_path),
+        thumbnails_url="/thumbnails",
+        thumbnail_format="JPEG",
+        source=content,
+    )
+    image, (width, height) = open_image(content, decode=False)
+
+    def broken_encode(*args):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(image_pipeline, "_encode_thumbnail", broken_encode)
+        with pytest.raises(OSError):
+            generate_derivatives(image, "img", width, height, ".jpg", **options)
+    assert [p.name for p in tmp_path.iterdir()] == ["img_preview.webp"]
+
+    result = generate_derivatives(image, "img", width, height, ".jpg", **options)
+    assert result["thumbnail_url"] == "/thumbnails/img_thumbnail.jpg"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["img_preview.webp", "img_thumbnail.jpg"]